@@ -0,0 +1,338 @@
+"""
+Seeded micro-benchmarks for the modules of the repo, with a regression check against a baseline.
+
+Every benchmark builds its workload from the seed, so two runs time exactly the same operations.
+Each one runs an untimed warmup round, then --repeats timed repeats; a repeat keeps running rounds
+of the workload until it has timed at least MIN_OPERATIONS operations and MIN_SECONDS seconds, so
+small --scale values still give stable numbers. Repeats are interleaved across the benchmarks, so
+a slow spell of the machine does not hit every repeat of one benchmark, and the best repeat is
+compared with the baseline (the median is reported alongside). Finally each workload is measured
+again under tracemalloc (peak memory above the workload's own setup).
+
+    python benchmark.py                      # run everything, compare with benchmark_baseline.json
+    python benchmark.py inventory --scale 0.1
+    python benchmark.py --update-baseline    # record the current numbers as the new baseline
+
+The run exits with status 1 when a benchmark's throughput drops, or its peak memory grows, by
+more than --threshold relative to the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+# keep the per-item Inventory log records away from the console and the log file while timing
+os.environ.setdefault("SMALL_MASTERPIECES_LOG_SINKS", "")
+
+import numpy as np
+
+from calculator import fraction_to_decimal
+from deck import DeckOfCards
+from dragon import Dragon, Rectangle
+from inventory import Inventory
+from operator_overloading import Complex, ComplexArray
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_REPEATS = 5
+# every timed repeat covers at least this many operations and this much time
+MIN_OPERATIONS = 100
+MIN_SECONDS = 0.1
+LATENCY_PERCENTILES = (50, 90, 95, 99)
+# peak memory growth below this many bytes is allocator noise, not a regression
+MEMORY_TOLERANCE_BYTES = 64 * 1024
+
+
+def _primes(low, high):
+    """Returns the primes in [low, high) from a sieve of Eratosthenes."""
+    sieve = np.ones(high, dtype=bool)
+    sieve[:2] = False
+    for n in range(2, int(high ** 0.5) + 1):
+        if sieve[n]:
+            sieve[n * n::n] = False
+    primes = np.nonzero(sieve)[0]
+    return primes[primes >= low].tolist()
+
+
+def _fraction_workload(method):
+    def setup(rng, scale):
+        # primes other than 2 and 5 give purely periodic expansions, mostly with periods close to p
+        primes = _primes(10_000, 50_000)
+        calls = [(rng.randrange(1, p), p, method) for p in rng.sample(primes, max(1, int(40 * scale)))]
+        return fraction_to_decimal, calls
+    return setup
+
+
+def _random_rectangle(rng, extent, size):
+    x, y = rng.uniform(-extent, extent), rng.uniform(-extent, extent)
+    return x, y, x + rng.uniform(0, size), y + rng.uniform(0, size)
+
+
+def _rectangle_overlaps(rng, scale):
+    rectangles = [Rectangle(*_random_rectangle(rng, 1000, 50)) for _ in range(max(2, int(200_000 * scale)))]
+    return Rectangle.overlaps, list(zip(rectangles[::2], rectangles[1::2]))
+
+
+def _dragon_in_area(rng, scale):
+    calls = []
+    for i in range(max(1, int(100_000 * scale))):
+        dragon = Dragon(f"Dragon {i}", rng.uniform(-1000, 1000), rng.uniform(-1000, 1000),
+                        rng.uniform(1, 20), rng.uniform(1, 20), rng.uniform(1, 50))
+        calls.append((dragon, *_random_rectangle(rng, 1000, 100)))
+    return Dragon.in_area, calls
+
+
+def _inventory_items(rng, count):
+    return [(f"item-{i}", round(rng.uniform(0.5, 500), 2), rng.randint(1, 10)) for i in range(count)]
+
+
+def _inventory_add_item(rng, scale):
+    items = _inventory_items(rng, max(1, int(50_000 * scale)))
+    inventory = Inventory(max_capacity=10 * len(items))
+    return inventory.add_item, items
+
+
+def _inventory_delete_item(rng, scale):
+    items = _inventory_items(rng, max(1, int(50_000 * scale)))
+    inventory = Inventory(max_capacity=10 * len(items))
+    inventory.add_items(items)
+    names = [(name,) for name, _, _ in items]
+    rng.shuffle(names)
+    return inventory.delete_item, names
+
+
+def _inventory_price_range(rng, scale):
+    items = _inventory_items(rng, max(1, int(50_000 * scale)))
+    inventory = Inventory(max_capacity=10 * len(items))
+    inventory.add_items(items)
+    ranges = []
+    for _ in range(max(1, int(20_000 * scale))):
+        low = rng.uniform(0.5, 500)
+        ranges.append((low, low + rng.uniform(0, 5)))
+    return inventory.find_items_in_price_range, ranges
+
+
+def _deck_shuffle(rng, scale):
+    deck = DeckOfCards()
+    deck.create_deck()
+    shuffle_rng = random.Random(rng.random())
+    return deck.shuffle_deck, [(shuffle_rng,)] * max(1, int(50_000 * scale))
+
+
+def _random_complex(rng):
+    return Complex(rng.uniform(-100, 100), rng.uniform(-100, 100))
+
+
+def _complex_arithmetic(rng, scale):
+    def arithmetic(a, b):
+        return ((a + b) * (a - b) / b).mod()
+    return arithmetic, [(_random_complex(rng), _random_complex(rng)) for _ in range(max(1, int(100_000 * scale)))]
+
+
+def _complex_array_arithmetic(rng, scale):
+    def arithmetic(a, b):
+        return ((a + b) * (a - b) / b).abs()
+    calls = []
+    for _ in range(max(1, int(50 * scale))):
+        values = [_random_complex(rng) for _ in range(20_000)]
+        calls.append((ComplexArray.from_complex(values[:10_000]), ComplexArray.from_complex(values[10_000:])))
+    return arithmetic, calls
+
+
+# name -> (setup(rng, scale) returning (operation, list of argument tuples), calls timed together,
+# whether the calls can be replayed on the same state); cheap operations are timed in groups so that
+# timer overhead does not dominate their latency, and workloads that change their state get a fresh
+# setup for every round
+BENCHMARKS = {
+    "calculator.fraction_to_decimal.long_division": (_fraction_workload("long_division"), 1, True),
+    "calculator.fraction_to_decimal.number_theory": (_fraction_workload("number_theory"), 1, True),
+    "dragon.Rectangle.overlaps": (_rectangle_overlaps, 100, True),
+    "dragon.Dragon.in_area": (_dragon_in_area, 100, True),
+    "inventory.Inventory.add_item": (_inventory_add_item, 10, False),
+    "inventory.Inventory.delete_item": (_inventory_delete_item, 10, False),
+    "inventory.Inventory.find_items_in_price_range": (_inventory_price_range, 10, True),
+    "deck.DeckOfCards.shuffle_deck": (_deck_shuffle, 10, True),
+    "operator_overloading.Complex.arithmetic": (_complex_arithmetic, 100, True),
+    "operator_overloading.ComplexArray.arithmetic": (_complex_array_arithmetic, 1, True),
+}
+
+
+def run_benchmark(name, seed=0, scale=1.0, repeats=DEFAULT_REPEATS):
+    """Runs one benchmark and returns its best and median throughput, latency percentiles and peak memory."""
+    return run_benchmarks([name], seed, scale, repeats)[name]
+
+
+def run_benchmarks(names, seed=0, scale=1.0, repeats=DEFAULT_REPEATS):
+    """Runs the benchmarks with their repeats interleaved; returns name -> result as in run_benchmark."""
+    runs = [_Run(name, seed, scale) for name in names]
+    for _ in range(repeats):
+        for run in runs:
+            run.repeat()
+    return {run.name: run.result() for run in runs}
+
+
+class _Run:
+    """One benchmark's workload, warmed up on creation, and the repeats timed on it so far."""
+
+    def __init__(self, name, seed, scale):
+        self.name = name
+        self.seed = seed
+        self.scale = scale
+        self.setup, self.group_size, self.replayable = BENCHMARKS[name]
+        self.operation, self.calls = self.setup(random.Random(f"{seed}:{name}"), scale)
+        _time_round(self.operation, self.calls, self.group_size, [])  # warmup
+        self.group_seconds = []
+        self.throughputs = []
+        self.operations = 0
+        self.seconds = 0.0
+
+    def repeat(self):
+        operations = 0
+        seconds = 0.0
+        while operations < MIN_OPERATIONS or seconds < MIN_SECONDS:
+            if not self.replayable:
+                self.operation, self.calls = self.setup(random.Random(f"{self.seed}:{self.name}"), self.scale)
+            seconds += _time_round(self.operation, self.calls, self.group_size, self.group_seconds)
+            operations += len(self.calls)
+        self.throughputs.append(operations / seconds if seconds else float("inf"))
+        self.operations += operations
+        self.seconds += seconds
+
+    def result(self):
+        latencies = np.percentile(self.group_seconds, LATENCY_PERCENTILES)
+        return {
+            "operations": self.operations,
+            "seconds": self.seconds,
+            "repeats": len(self.throughputs),
+            "throughput_ops_per_second": max(self.throughputs),
+            "median_throughput_ops_per_second": statistics.median(self.throughputs),
+            "latency_seconds": {f"p{p}": float(latency) for p, latency in zip(LATENCY_PERCENTILES, latencies)},
+            "peak_memory_bytes": _peak_memory(self.name, self.seed, self.scale),
+        }
+
+
+def _time_round(operation, calls, group_size, group_seconds):
+    """Times one pass over `calls`, appending the per-call time of each group; returns the total."""
+    total_seconds = 0.0
+    perf_counter = time.perf_counter
+    for start in range(0, len(calls), group_size):
+        group = calls[start:start + group_size]
+        began = perf_counter()
+        for args in group:
+            operation(*args)
+        elapsed = perf_counter() - began
+        total_seconds += elapsed
+        group_seconds.append(elapsed / len(group))
+    return total_seconds
+
+
+def _peak_memory(name, seed, scale):
+    """Re-runs the workload under tracemalloc; returns the peak allocated above the setup."""
+    setup, _, _ = BENCHMARKS[name]
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        operation, calls = setup(random.Random(f"{seed}:{name}"), scale)
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for args in calls:
+            operation(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    return max(0, peak - baseline)
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Returns one message per benchmark that regressed by more than `threshold` against `baseline`."""
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        expected = reference["throughput_ops_per_second"]
+        actual = result["throughput_ops_per_second"]
+        if actual < expected * (1 - threshold):
+            regressions.append(f"{name}: throughput {actual:,.0f} ops/s, baseline {expected:,.0f} ops/s "
+                               f"({actual / expected - 1:+.1%})")
+        expected = reference["peak_memory_bytes"]
+        actual = result["peak_memory_bytes"]
+        if actual > expected * (1 + threshold) and actual - expected > MEMORY_TOLERANCE_BYTES:
+            regressions.append(f"{name}: peak memory {actual:,} B, baseline {expected:,} B "
+                               f"({actual / expected - 1:+.1%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("benchmarks", nargs="*",
+                        help="benchmarks to run, by name or name prefix (default: all)")
+    parser.add_argument("--seed", type=int, default=0, help="workload seed (default: 0)")
+    parser.add_argument("--scale", type=float, default=1.0, help="workload size multiplier (default: 1.0)")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS,
+                        help=f"timed repeats per benchmark, the best is compared (default: {DEFAULT_REPEATS})")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE,
+                        help=f"baseline JSON file (default: {DEFAULT_BASELINE})")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"allowed relative slowdown or memory growth (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store the results as the baseline instead of comparing with it")
+    args = parser.parse_args(argv)
+    if args.repeats < 1:
+        parser.error("--repeats must be at least 1")
+
+    names = [name for name in BENCHMARKS
+             if not args.benchmarks or any(name.startswith(prefix) for prefix in args.benchmarks)]
+    if not names:
+        parser.error(f"no benchmark matches {args.benchmarks}")
+
+    results = run_benchmarks(names, args.seed, args.scale, args.repeats)
+    for name, result in results.items():
+        print(f"{name:48} {result['throughput_ops_per_second']:>14,.0f} ops/s  "
+              f"p50 {result['latency_seconds']['p50'] * 1e6:>10,.2f} us  "
+              f"p99 {result['latency_seconds']['p99'] * 1e6:>10,.2f} us  "
+              f"peak {result['peak_memory_bytes'] / 1024:>10,.1f} KiB")
+
+    report = {
+        "timestamp": time.time(),
+        "seed": args.seed,
+        "scale": args.scale,
+        "repeats": args.repeats,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "benchmarks": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one")
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    if (baseline["seed"], baseline["scale"]) != (args.seed, args.scale):
+        print(f"Baseline was recorded with seed {baseline['seed']} and scale {baseline['scale']}; "
+              f"results are not comparable")
+        return 1
+    regressions = compare(results, baseline["benchmarks"], args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
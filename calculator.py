@@ -1,4 +1,27 @@
-def fraction_to_decimal(numerator: int, denominator: int) -> str:
+import functools
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from metrics import instrument
+
+# number of decimal digits produced by one big-integer long-division step
+_BLOCK_DIGITS = 1000
+
+# number of reduced denominators whose decimal structure is kept in the LRU cache
+_STRUCTURE_CACHE_SIZE = 16_384
+
+# number of (numerator, denominator) pairs sent to a worker process at once
+_BATCH_CHUNK_SIZE = 10_000
+
+# Miller-Rabin witnesses that make the test deterministic for n < 3.3 * 10**24
+_PRIME_WITNESSES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+
+
+@instrument("calculator.fraction_to_decimal")
+def fraction_to_decimal(numerator: int, denominator: int, method: str = "long_division") -> str:
     """
     Converts a fraction to its decimal representation as a string.
 
@@ -11,6 +34,13 @@ def fraction_to_decimal(numerator: int, denominator: int) -> str:
         The numerator of the fraction.
     denominator : int
         The denominator of the fraction (non-zero).
+    method : str, optional
+        Algorithm used to find the repeating block, by default "long_division".
+        "long_division" remembers every remainder in a dictionary, so its memory
+        grows with the period. "number_theory" derives the pre-period from the
+        factors 2 and 5 of the reduced denominator and the period from the
+        multiplicative order of 10, then produces the digits directly, so no
+        remainders are stored. Prefer it for large denominators.
 
     Returns
     -------
@@ -25,6 +55,14 @@ def fraction_to_decimal(numerator: int, denominator: int) -> str:
     - If the decimal has a repeating sequence, it is enclosed in parentheses.
     - A dictionary (`lookup`) is used to detect repeating decimals by storing 
       the positions of remainders.
+    - Both methods return the same string.
+
+    Raises
+    ------
+    ValueError
+        If `method` is not one of the supported algorithms.
+    ZeroDivisionError
+        If `denominator` is zero, including ``0 / 0``.
 
     Examples
     --------
@@ -45,7 +83,16 @@ def fraction_to_decimal(numerator: int, denominator: int) -> str:
 
     >>> fraction_to_decimal(1, 5)
     '0.2'
+
+    >>> fraction_to_decimal(1, 7, method="number_theory")
+    '0.(142857)'
     """
+    if method == "number_theory":
+        return _fraction_to_decimal_number_theory(numerator, denominator)
+    if method != "long_division":
+        raise ValueError(f"unknown method '{method}'")
+    if denominator == 0:
+        raise ZeroDivisionError("integer division or modulo by zero")
     if numerator == 0:
         return "0"
     result = []
@@ -69,9 +116,9 @@ def fraction_to_decimal(numerator: int, denominator: int) -> str:
     lookup = {}
     while reminder != 0:
         if reminder in lookup:
-            result.insert(lookup[reminder], "(")
-            result.append(')')
-            break
+            # joining around the cycle start avoids an O(n) list.insert on long outputs
+            position = lookup[reminder]
+            return "".join(result[:position]) + "(" + "".join(result[position:]) + ")"
         lookup[reminder] = len(result)
         reminder *= 10
         result.append(str(reminder // denominator))
@@ -79,6 +126,358 @@ def fraction_to_decimal(numerator: int, denominator: int) -> str:
     return "".join(result)
 
 
+def iter_decimal_digits(numerator: int, denominator: int, max_digits: int = None,
+                        chunk_size: int = _BLOCK_DIGITS):
+    """
+    Lazily generates the decimal representation of a fraction.
+
+    Yields string fragments which, joined together, give the same result as
+    `fraction_to_decimal`: first the sign and the integer part, then ".", the
+    pre-period digits, "(", the repeating block and ")". The lengths of the
+    pre-period and of the period are known before any digit is produced, so the
+    expansion never has to be held in memory.
+
+    Parameters
+    ----------
+    numerator : int
+        The numerator of the fraction.
+    denominator : int
+        The denominator of the fraction (non-zero).
+    max_digits : int, optional
+        Maximum number of digits after the decimal point. If the expansion is
+        longer, its first `max_digits` digits are yielded without parentheses
+        followed by "...". By default the full expansion is produced.
+    chunk_size : int, optional
+        Maximum number of digits in a single yielded fragment.
+
+    Yields
+    ------
+    str
+        Consecutive fragments of the decimal representation.
+
+    Examples
+    --------
+    >>> list(iter_decimal_digits(-7, 12))
+    ['-0', '.', '58', '(', '3', ')']
+
+    >>> "".join(iter_decimal_digits(1, 7, max_digits=4))
+    '0.1428...'
+    """
+    if denominator == 0:
+        raise ZeroDivisionError("integer division or modulo by zero")
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    if numerator == 0:
+        yield "0"
+        return
+    sign = "-" if (numerator < 0) != (denominator < 0) else ""
+    numerator = abs(numerator)
+    denominator = abs(denominator)
+    divisor = math.gcd(numerator, denominator)
+    numerator //= divisor
+    denominator //= divisor
+
+    integer_part, reminder = divmod(numerator, denominator)
+    yield f"{sign}{integer_part}"
+    if reminder == 0:
+        return
+
+    if max_digits is None:
+        pre_period, period, _, _ = _decimal_structure(denominator)
+    else:
+        # a truncated expansion only needs to know whether the period fits, which a bounded
+        # walk over the powers of 10 answers without factoring for the multiplicative order
+        pre_period, _, modulus = _split_denominator(denominator)
+        period = _bounded_period(modulus, max_digits - pre_period)
+    if period is None or (max_digits is not None and pre_period + period > max_digits):
+        if max_digits > 0:
+            yield "."
+            yield from _iter_long_division(reminder, denominator, max_digits, chunk_size)
+        yield "..."
+        return
+
+    yield "."
+    yield from _iter_long_division(reminder, denominator, pre_period, chunk_size)
+    if period == 0:
+        return
+    yield "("
+    reminder = reminder * pow(10, pre_period, denominator) % denominator
+    yield from _iter_long_division(reminder, denominator, period, chunk_size)
+    yield ")"
+
+
+def write_decimal(numerator: int, denominator: int, stream, max_digits: int = None,
+                  chunk_size: int = _BLOCK_DIGITS) -> int:
+    """
+    Writes the decimal representation of a fraction to a text stream chunk by chunk.
+
+    Parameters
+    ----------
+    numerator : int
+        The numerator of the fraction.
+    denominator : int
+        The denominator of the fraction (non-zero).
+    stream : file-like
+        Any object with a `write(str)` method, e.g. an open text file or a socket
+        wrapped with `makefile("w")`.
+    max_digits : int, optional
+        Maximum number of digits after the decimal point, see `iter_decimal_digits`.
+    chunk_size : int, optional
+        Maximum number of digits passed to a single `write` call.
+
+    Returns
+    -------
+    int
+        The number of characters written.
+    """
+    written = 0
+    for fragment in iter_decimal_digits(numerator, denominator, max_digits, chunk_size):
+        stream.write(fragment)
+        written += len(fragment)
+    return written
+
+
+@instrument("calculator.fractions_to_decimal")
+def fractions_to_decimal(pairs, workers: int = None) -> list[str]:
+    """
+    Converts many fractions to their decimal representations.
+
+    The structure of every reduced denominator (pre-period, period and repeating
+    block of its reciprocal) is kept in a bounded LRU cache, so converting another
+    numerator over a known denominator costs a couple of big-integer
+    multiplications instead of a new search for the cycle.
+
+    Parameters
+    ----------
+    pairs : iterable of (int, int)
+        The (numerator, denominator) pairs to convert.
+    workers : int, optional
+        Number of worker processes. Large batches are split into chunks and spread
+        over a process pool; by default everything runs in the calling process.
+
+    Returns
+    -------
+    list of str
+        The decimal representations, in the order of `pairs`. Each one equals
+        ``fraction_to_decimal(numerator, denominator)``.
+
+    Examples
+    --------
+    >>> fractions_to_decimal([(1, 3), (2, 3), (-50, 8)])
+    ['0.(3)', '0.(6)', '-6.25']
+    """
+    pairs = list(pairs)
+    if not workers or workers == 1 or len(pairs) <= _BATCH_CHUNK_SIZE:
+        return _convert_chunk(pairs)
+    chunks = [pairs[i:i + _BATCH_CHUNK_SIZE] for i in range(0, len(pairs), _BATCH_CHUNK_SIZE)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for converted in executor.map(_convert_chunk, chunks):
+            results.extend(converted)
+    return results
+
+
+def _convert_chunk(pairs) -> list[str]:
+    """Converts a chunk of (numerator, denominator) pairs in the current process."""
+    return [_fraction_to_decimal_cached(numerator, denominator) for numerator, denominator in pairs]
+
+
+def _fraction_to_decimal_cached(numerator: int, denominator: int) -> str:
+    """Converts a single fraction using the cached structure of its reduced denominator."""
+    if denominator == 0:
+        raise ZeroDivisionError("integer division or modulo by zero")
+    if numerator == 0:
+        return "0"
+    sign = "-" if (numerator < 0) != (denominator < 0) else ""
+    numerator = abs(numerator)
+    denominator = abs(denominator)
+    divisor = math.gcd(numerator, denominator)
+    numerator //= divisor
+    denominator //= divisor
+
+    integer_part, reminder = divmod(numerator, denominator)
+    if reminder == 0:
+        return f"{sign}{integer_part}"
+    pre_period, period, cofactor, repetend = _decimal_structure(denominator)
+    if period and repetend is None:
+        return sign + "".join(iter_decimal_digits(numerator, denominator))
+
+    pre_digits, reminder = divmod(reminder * 10 ** pre_period, denominator)
+    pre_digits = str(pre_digits).zfill(pre_period) if pre_period else ""
+    if period == 0:
+        return f"{sign}{integer_part}.{pre_digits}"
+    # the reminder is a multiple of the cofactor, what is left is k / m with gcd(m, 10) == 1
+    # whose repeating block is k times the repetend of 1 / m
+    period_digits = str(reminder // cofactor * repetend).zfill(period)
+    return f"{sign}{integer_part}.{pre_digits}({period_digits})"
+
+
+def _fraction_to_decimal_number_theory(numerator: int, denominator: int) -> str:
+    """
+    Converts a fraction to its decimal representation without storing remainders.
+
+    The fraction is reduced by the gcd first. Writing the reduced denominator as
+    ``2**a * 5**b * m`` with ``gcd(m, 10) == 1``, the pre-period has ``max(a, b)``
+    digits and the period equals the multiplicative order of 10 modulo ``m``.
+    Knowing both lengths up front, the digits are produced in blocks by
+    big-integer long division.
+    """
+    return "".join(iter_decimal_digits(numerator, denominator))
+
+
+def _iter_long_division(reminder: int, denominator: int, count: int, chunk_size: int):
+    """
+    Yields `count` decimal digits of ``reminder / denominator`` in blocks of at
+    most `chunk_size` digits, each block being a single big-integer division.
+    """
+    while count > 0:
+        step = min(count, chunk_size)
+        block, reminder = divmod(reminder * 10 ** step, denominator)
+        yield str(block).zfill(step)
+        count -= step
+
+
+@functools.lru_cache(maxsize=_STRUCTURE_CACHE_SIZE)
+def _decimal_structure(denominator: int) -> tuple[int, int, int, int]:
+    """
+    Describes the decimal expansion of ``k / denominator`` for any `k` coprime to
+    a positive `denominator`.
+
+    Returns a tuple ``(pre_period, period, cofactor, repetend)`` where `cofactor`
+    is the ``2**a * 5**b`` part of the denominator and `repetend` is the repeating
+    block of ``1 / (denominator // cofactor)`` as an integer. The repetend is only
+    kept for periods up to `_BLOCK_DIGITS` digits, otherwise it is None.
+    """
+    pre_period, cofactor, modulus = _split_denominator(denominator)
+    if modulus == 1:
+        return pre_period, 0, cofactor, None
+    period = _multiplicative_order(10, modulus)
+    repetend = (10 ** period - 1) // modulus if period <= _BLOCK_DIGITS else None
+    return pre_period, period, cofactor, repetend
+
+
+def _split_denominator(denominator: int) -> tuple[int, int, int]:
+    """
+    Splits a positive `denominator` into ``cofactor * modulus`` where `cofactor`
+    is its ``2**a * 5**b`` part, returning ``(max(a, b), cofactor, modulus)``.
+    """
+    modulus = denominator
+    twos = fives = 0
+    while modulus % 2 == 0:
+        modulus //= 2
+        twos += 1
+    while modulus % 5 == 0:
+        modulus //= 5
+        fives += 1
+    return max(twos, fives), denominator // modulus, modulus
+
+
+def _bounded_period(modulus: int, limit: int):
+    """
+    Returns the multiplicative order of 10 modulo `modulus` (0 when `modulus` is 1)
+    if it is at most `limit`, otherwise None. Costs at most `limit` modular
+    multiplications and never factors the modulus.
+    """
+    if modulus == 1:
+        return 0
+    power = 10 % modulus
+    for k in range(1, limit + 1):
+        if power == 1:
+            return k
+        power = power * 10 % modulus
+    return None
+
+
+def _multiplicative_order(base: int, modulus: int) -> int:
+    """
+    Returns the smallest positive `k` with ``base**k % modulus == 1``.
+
+    The order divides the Carmichael function of `modulus`, so we start from it
+    and strip prime factors for as long as the power still equals one.
+    """
+    order = 1
+    for prime, exponent in _prime_factors(modulus).items():
+        if prime == 2 and exponent > 2:
+            factor_lambda = 2 ** (exponent - 2)
+        else:
+            factor_lambda = prime ** (exponent - 1) * (prime - 1)
+        order = order * factor_lambda // math.gcd(order, factor_lambda)
+    for prime in _prime_factors(order):
+        while order % prime == 0 and pow(base, order // prime, modulus) == 1:
+            order //= prime
+    return order
+
+
+def _prime_factors(n: int) -> dict[int, int]:
+    """Returns the prime factorization of `n` as a mapping prime -> exponent."""
+    factors = {}
+    for prime in (2, 3, 5, 7, 11, 13):
+        while n % prime == 0:
+            factors[prime] = factors.get(prime, 0) + 1
+            n //= prime
+    pending = [n] if n > 1 else []
+    while pending:
+        n = pending.pop()
+        if _is_probable_prime(n):
+            factors[n] = factors.get(n, 0) + 1
+            continue
+        divisor = _pollard_brent(n)
+        pending.append(divisor)
+        pending.append(n // divisor)
+    return factors
+
+
+def _is_probable_prime(n: int) -> bool:
+    """Miller-Rabin primality test, deterministic below 3.3 * 10**24."""
+    if n < 2:
+        return False
+    for prime in _PRIME_WITNESSES:
+        if n % prime == 0:
+            return n == prime
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for witness in _PRIME_WITNESSES:
+        x = pow(witness, d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _pollard_brent(n: int) -> int:
+    """Returns a non-trivial divisor of the odd composite `n` (Brent's variant of Pollard's rho)."""
+    while True:
+        y, c, m = random.randrange(1, n), random.randrange(1, n), 128
+        g = r = q = 1
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(m, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = math.gcd(q, n)
+                k += m
+            r *= 2
+        if g == n:
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = math.gcd(abs(x - ys), n)
+        if g != n:
+            return g
+
+
 class Calculator:
     """
     A simple calculator class that provides basic arithmetic operations.
@@ -98,6 +497,7 @@ class Calculator:
         """
         self.__result = result
 
+    @instrument("calculator.Calculator.add")
     def add(self, a):
         """
         Adds a number to the current result.
@@ -109,6 +509,7 @@ class Calculator:
         """
         self.__result += a
 
+    @instrument("calculator.Calculator.subtract")
     def subtract(self, a):
         """
         Subtracts a number from the current result.
@@ -120,6 +521,7 @@ class Calculator:
         """
         self.__result -= a
 
+    @instrument("calculator.Calculator.multiply")
     def multiply(self, a):
         """
         Multiplies the current result by a given number.
@@ -131,6 +533,7 @@ class Calculator:
         """
         self.__result = self.__result * a
 
+    @instrument("calculator.Calculator.divide")
     def divide(self, a):
         """
         Divides the current result by a given number.
@@ -150,6 +553,7 @@ class Calculator:
         else:
             self.__result = self.__result / a
 
+    @instrument("calculator.Calculator.modulo")
     def modulo(self, a):
         """
         Computes the remainder of the division of the current result by a given number.
@@ -169,6 +573,7 @@ class Calculator:
         else:
             self.__result = self.__result % a
 
+    @instrument("calculator.Calculator.power")
     def power(self, a):
         """
         Raises the current result to the power of a given number.
@@ -180,6 +585,7 @@ class Calculator:
         """
         self.__result = self.__result ** a
 
+    @instrument("calculator.Calculator.square_root")
     def square_root(self):
         """
         Computes the square root of the current result.
@@ -206,3 +612,212 @@ class Calculator:
             The current result.
         """
         return self.__result
+
+
+class ArrayCalculator:
+    """
+    A calculator that holds a NumPy vector of results and applies every operation
+    to the whole vector at once.
+
+    Division and modulo by zero do not raise. The affected elements become NaN
+    and are flagged in a boolean mask, so one bad element does not stop the batch.
+    Powers and square roots that turn finite elements into NaN or infinity are
+    flagged the same way.
+    Every operation is recorded, so the same chain can be replayed on new
+    batches of starting values.
+
+    Attributes:
+        __result (numpy.ndarray): Stores the current results, one per starting value.
+        __invalid (numpy.ndarray): Marks elements that were divided by zero,
+            square-rooted while negative or raised to a non-finite power.
+        __operations (list): The recorded chain as (method name, arguments) tuples.
+    """
+
+    def __init__(self, values=0):
+        """
+        Initializes the calculator with a batch of starting values.
+
+        Parameters
+        ----------
+        values : float or array_like, optional
+            Initial values of the calculator, by default a single 0.
+        """
+        self.__result = np.array(values, dtype=float, ndmin=1)
+        self.__invalid = np.zeros(self.__result.shape, dtype=bool)
+        self.__operations = []
+
+    def add(self, a):
+        """
+        Adds a number or an array of numbers to the current results.
+
+        Parameters
+        ----------
+        a : float or array_like
+            The number(s) to be added, broadcast against the results.
+        """
+        self.__operations.append(("add", (a,)))
+        self.__result = self.__result + a
+
+    def subtract(self, a):
+        """
+        Subtracts a number or an array of numbers from the current results.
+
+        Parameters
+        ----------
+        a : float or array_like
+            The number(s) to be subtracted, broadcast against the results.
+        """
+        self.__operations.append(("subtract", (a,)))
+        self.__result = self.__result - a
+
+    def multiply(self, a):
+        """
+        Multiplies the current results by a number or an array of numbers.
+
+        Parameters
+        ----------
+        a : float or array_like
+            The number(s) to multiply by, broadcast against the results.
+        """
+        self.__operations.append(("multiply", (a,)))
+        self.__result = self.__result * a
+
+    def divide(self, a):
+        """
+        Divides the current results by a number or an array of numbers.
+
+        Parameters
+        ----------
+        a : float or array_like
+            The number(s) to divide by, broadcast against the results.
+
+        Notes
+        -----
+        Elements divided by zero become NaN and are flagged in `get_invalid_mask`.
+        """
+        self.__operations.append(("divide", (a,)))
+        self.__apply_masked(np.divide, a)
+
+    def modulo(self, a):
+        """
+        Computes the remainder of the division of the current results by a number
+        or an array of numbers.
+
+        Parameters
+        ----------
+        a : float or array_like
+            The divisor(s), broadcast against the results.
+
+        Notes
+        -----
+        Elements taken modulo zero become NaN and are flagged in `get_invalid_mask`.
+        """
+        self.__operations.append(("modulo", (a,)))
+        self.__apply_masked(np.mod, a)
+
+    def power(self, a):
+        """
+        Raises the current results to the power of a number or an array of numbers.
+
+        Parameters
+        ----------
+        a : float or array_like
+            The exponent(s), broadcast against the results.
+
+        Notes
+        -----
+        Finite elements whose power is NaN or infinite (a fractional power of a
+        negative number, a negative power of zero, an overflow) are flagged in
+        `get_invalid_mask`.
+        """
+        self.__operations.append(("power", (a,)))
+        exponent = np.asarray(a, dtype=float)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            result = self.__result ** exponent
+        finite = np.isfinite(self.__result) & np.isfinite(exponent)
+        self.__result = result
+        self.__invalid = self.__invalid | (finite & ~np.isfinite(result))
+
+    def square_root(self):
+        """
+        Computes the square root of the current results.
+
+        Notes
+        -----
+        Negative elements become NaN and are flagged in `get_invalid_mask`.
+        """
+        self.__operations.append(("square_root", ()))
+        negative = self.__result < 0
+        with np.errstate(invalid="ignore"):
+            self.__result = np.sqrt(self.__result)
+        self.__invalid = self.__invalid | negative
+
+    def clear(self):
+        """
+        Resets all current results to zero and clears the invalid mask.
+        """
+        self.__operations.append(("clear", ()))
+        self.__result = np.zeros(self.__result.shape)
+        self.__invalid = np.zeros(self.__result.shape, dtype=bool)
+
+    def get_result(self):
+        """
+        Returns the current results of the calculator.
+
+        Returns
+        -------
+        numpy.ndarray
+            The current results, one per starting value.
+        """
+        return self.__result
+
+    def get_invalid_mask(self):
+        """
+        Returns the mask of elements that hit an invalid operation.
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean array, True where a division or modulo by zero, the square
+            root of a negative number or a non-finite power happened.
+        """
+        return self.__invalid
+
+    def get_operations(self):
+        """
+        Returns the recorded chain of operations.
+
+        Returns
+        -------
+        list of tuple
+            (method name, arguments) tuples in the order they were applied.
+        """
+        return list(self.__operations)
+
+    def replay(self, values):
+        """
+        Applies the recorded chain of operations to a new batch of starting values.
+
+        Parameters
+        ----------
+        values : float or array_like
+            The starting values of the new batch.
+
+        Returns
+        -------
+        ArrayCalculator
+            A new calculator holding the results for the new batch.
+        """
+        calculator = ArrayCalculator(values)
+        for name, args in self.__operations:
+            getattr(calculator, name)(*args)
+        return calculator
+
+    def __apply_masked(self, operation, a):
+        """Applies a division-like operation, turning zero divisors into NaN instead of raising."""
+        divisor = np.asarray(a, dtype=float)
+        zero = np.broadcast_to(divisor == 0, np.broadcast_shapes(self.__result.shape, divisor.shape))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result = operation(self.__result, np.where(divisor == 0, 1.0, divisor))
+        self.__result = np.where(zero, np.nan, result)
+        self.__invalid = self.__invalid | zero
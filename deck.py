@@ -1,4 +1,11 @@
 import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# cards as compact integer codes: suit_index * CARDS_PER_SUIT + rank_index, in 0..51
+CARDS_PER_SUIT = 13
+CARDS_PER_DECK = 52
 
 
 class DeckOfCards:
@@ -23,22 +30,141 @@ class DeckOfCards:
         self.__cards = []
 
     def create_deck(self):
-        for suit in DeckOfCards().SUITS:
-            for rank in DeckOfCards().RANKS:
+        for suit in self.SUITS:
+            for rank in self.RANKS:
                 self.__cards.append((suit, rank))
 
-    def shuffle_deck(self):
-        random.shuffle(self.__cards)
+    def shuffle_deck(self, rng=None):
+        # rng is an optional random.Random (or a seed for one) for reproducible shuffles
+        if rng is None:
+            rng = random
+        elif not isinstance(rng, random.Random):
+            rng = random.Random(rng)
+        rng.shuffle(self.__cards)
 
     def deal_card(self):
-        while self.__cards:
-            self.__cards.pop()
-        return None
+        # deals the top card, or returns None when the deck is empty
+        if not self.__cards:
+            return None
+        return self.__cards.pop()
+
+    def deal_hand(self, n):
+        if not 0 <= n <= len(self.__cards):
+            raise ValueError(f"cannot deal {n} cards from a deck of {len(self.__cards)}")
+        hand = self.__cards[len(self.__cards) - n:]
+        del self.__cards[len(self.__cards) - n:]
+        hand.reverse()
+        return hand
 
     # don't touch below this line
 
     def __str__(self):
         return f"The deck has {len(self.__cards)} cards"
+
+
+def encode_card(card):
+    suit, rank = card
+    return DeckOfCards.SUITS.index(suit) * CARDS_PER_SUIT + DeckOfCards.RANKS.index(rank)
+
+
+def decode_card(code):
+    suit_index, rank_index = divmod(int(code), CARDS_PER_SUIT)
+    return DeckOfCards.SUITS[suit_index], DeckOfCards.RANKS[rank_index]
+
+
+class Shoe:
+    # one or more decks of integer-coded cards in a NumPy array; dealing only moves a position,
+    # so cards are never copied or popped one by one
+
+    def __init__(self, decks=1, rng=None):
+        self.decks = decks
+        self.__rng = np.random.default_rng(rng)
+        self.__cards = np.tile(np.arange(CARDS_PER_DECK, dtype=np.int8), decks)
+        self.__position = 0
+
+    def __len__(self):
+        return len(self.__cards) - self.__position
+
+    def shuffle(self):
+        # gathers every card back into the shoe and shuffles it
+        self.__rng.shuffle(self.__cards)
+        self.__position = 0
+
+    def deal_card(self):
+        # deals the next card code, or returns None when the shoe is empty
+        if self.__position >= len(self.__cards):
+            return None
+        card = int(self.__cards[self.__position])
+        self.__position += 1
+        return card
+
+    def deal_hand(self, n):
+        if not 0 <= n <= len(self):
+            raise ValueError(f"cannot deal {n} cards from a shoe of {len(self)}")
+        hand = self.__cards[self.__position:self.__position + n].copy()
+        self.__position += n
+        return hand
+
+    def __str__(self):
+        return f"The shoe has {len(self)} cards"
+
+
+def shuffle_decks(num_decks, rng=None):
+    # returns a (num_decks, 52) int8 array of independently shuffled decks, shuffled in one call
+    rng = np.random.default_rng(rng)
+    decks = np.broadcast_to(np.arange(CARDS_PER_DECK, dtype=np.int8), (num_decks, CARDS_PER_DECK))
+    return rng.permuted(decks, axis=1)
+
+
+def deal_hands(num_hands, hand_size, rng=None):
+    # deals one hand from each of num_hands freshly shuffled decks, as a (num_hands, hand_size) array;
+    # only the first hand_size steps of Fisher-Yates are run, vectorized over all decks
+    if not 0 <= hand_size <= CARDS_PER_DECK:
+        raise ValueError(f"cannot deal {hand_size} cards from a deck of {CARDS_PER_DECK}")
+    rng = np.random.default_rng(rng)
+    decks = np.tile(np.arange(CARDS_PER_DECK, dtype=np.int8), (num_hands, 1))
+    rows = np.arange(num_hands)
+    for position in range(hand_size):
+        picks = rng.integers(position, CARDS_PER_DECK, size=num_hands)
+        decks[rows, position], decks[rows, picks] = decks[rows, picks], decks[rows, position]
+    return decks[:, :hand_size]
+
+
+def count_flushes(hands):
+    # number of hands whose cards all share one suit
+    suits = hands // CARDS_PER_SUIT
+    return int(np.count_nonzero((suits == suits[:, :1]).all(axis=1)))
+
+
+def count_pairs(hands):
+    # number of hands holding at least two cards of the same rank
+    ranks = np.sort(hands % CARDS_PER_SUIT, axis=1)
+    return int(np.count_nonzero((ranks[:, 1:] == ranks[:, :-1]).any(axis=1)))
+
+
+def simulate_hands(statistic, num_hands, hand_size, seed, workers=None, block_size=100_000):
+    # deals num_hands random hands and returns the sum of statistic(hands_block) over all blocks.
+    # The work is cut into fixed blocks, each with its own stream spawned from SeedSequence(seed),
+    # so the result is bit-identical for any number of workers; workers only return their
+    # per-block totals. `statistic` must be a picklable (module level) function when workers are used.
+    block_sizes = [min(block_size, num_hands - start) for start in range(0, num_hands, block_size)]
+    streams = np.random.SeedSequence(seed).spawn(len(block_sizes))
+    tasks = [(statistic, size, hand_size, stream) for size, stream in zip(block_sizes, streams)]
+    if not workers or workers == 1:
+        totals = [_simulate_block(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            totals = list(executor.map(_simulate_block, *zip(*tasks)))
+    result = 0
+    for total in totals:
+        result = result + total
+    return result
+
+
+def _simulate_block(statistic, size, hand_size, stream):
+    return statistic(deal_hands(size, hand_size, np.random.default_rng(stream)))
+
+
 if __name__=='__main__':
     deck=DeckOfCards()
     deck.create_deck()
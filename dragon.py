@@ -1,3 +1,11 @@
+import heapq
+import math
+
+import numpy as np
+
+from metrics import instrument
+
+
 class Unit:
     """
         Base class representing a unit in a 2D coordinate system.
@@ -13,6 +21,9 @@ class Unit:
         Methods:
         --------
         - in_area(x1, y1, x2, y2): Checks if the unit (as a point) is within a specified rectangular area.
+        - get_bounds(): Returns the bounding box occupied by the unit.
+        - move_to(pos_x, pos_y), move_by(dx, dy): Move the unit and notify registered spatial structures.
+        - add_listener(listener), remove_listener(listener): Register structures to be told about moves.
         """
 
     def __init__(self, name, pos_x, pos_y):
@@ -28,6 +39,7 @@ class Unit:
         self.name = name
         self.pos_x = pos_x
         self.pos_y = pos_y
+        self.__listeners = []
 
     def in_area(self, x1, y1, x2, y2):
         """
@@ -42,7 +54,60 @@ class Unit:
         --------
         - bool: True if the unit is within the given area, False otherwise.
         """
-        pass
+        return (
+                min(x1, x2) <= self.pos_x <= max(x1, x2)
+                and min(y1, y2) <= self.pos_y <= max(y1, y2)
+        )
+
+    def get_bounds(self):
+        """
+        Returns the bounding box occupied by the unit.
+
+        Returns:
+        --------
+        - tuple: (left_x, bottom_y, right_x, top_y); for a point unit all four collapse onto its position.
+        """
+        return self.pos_x, self.pos_y, self.pos_x, self.pos_y
+
+    def move_to(self, pos_x, pos_y):
+        """
+        Moves the unit to a new position.
+
+        Every registered listener (e.g. a UnitIndex holding the unit) is notified through
+        its update(unit) method, so it can adjust incrementally instead of being rebuilt.
+
+        Parameters:
+        -----------
+        - pos_x (float): The new x-coordinate position of the unit.
+        - pos_y (float): The new y-coordinate position of the unit.
+        """
+        self.pos_x = pos_x
+        self.pos_y = pos_y
+        self._on_moved()
+        for listener in self.__listeners:
+            listener.update(self)
+
+    def move_by(self, dx, dy):
+        """
+        Moves the unit by an offset.
+
+        Parameters:
+        -----------
+        - dx (float): Offset along the x axis.
+        - dy (float): Offset along the y axis.
+        """
+        self.move_to(self.pos_x + dx, self.pos_y + dy)
+
+    def add_listener(self, listener):
+        """Registers an object with an update(unit) method to be notified after every move."""
+        self.__listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """Unregisters a listener added with add_listener."""
+        self.__listeners.remove(listener)
+
+    def _on_moved(self):
+        """Hook for subclasses that keep geometry derived from the position."""
 
 
 class Dragon(Unit):
@@ -62,6 +127,8 @@ class Dragon(Unit):
     Methods:
     --------
     - in_area(x1, y1, x2, y2): Checks if the dragon's hitbox overlaps with another rectangular area (e.g., another dragon).
+    - get_hit_box(): Returns the dragon's hitbox rectangle.
+    - get_bounds(): Returns the bounding box of the hitbox.
     """
 
     def __init__(self, name, pos_x, pos_y, height, width, fire_range):
@@ -84,6 +151,7 @@ class Dragon(Unit):
         self.__hit_box = Rectangle(pos_x - self.width / 2, pos_y - self.height / 2, pos_x + self.width / 2,
                                    pos_y + self.height / 2)
 
+    @instrument("dragon.Dragon.in_area")
     def in_area(self, x1, y1, x2, y2):
         """
         Determines whether the dragon's hitbox overlaps with a given rectangular area.
@@ -100,8 +168,33 @@ class Dragon(Unit):
         --------
         - bool: True if the dragon's hitbox overlaps with the area, False otherwise.
         """
-        r1 = Rectangle(x1, y1, x2, y2)
-        return r1.overlaps(self.__hit_box)
+        hit_box = self.__hit_box
+        return (
+                min(x1, x2) <= hit_box.get_right_x()
+                and max(x1, x2) >= hit_box.get_left_x()
+                and max(y1, y2) >= hit_box.get_bottom_y()
+                and min(y1, y2) <= hit_box.get_top_y()
+        )
+
+    def get_hit_box(self):
+        """Returns the rectangle occupied by the dragon."""
+        return self.__hit_box
+
+    def _on_moved(self):
+        """Re-centers the hitbox on the new position, in place."""
+        self.__hit_box.set_corners(self.pos_x - self.width / 2, self.pos_y - self.height / 2,
+                                   self.pos_x + self.width / 2, self.pos_y + self.height / 2)
+
+    def get_bounds(self):
+        """
+        Returns the bounding box occupied by the dragon's hitbox.
+
+        Returns:
+        --------
+        - tuple: (left_x, bottom_y, right_x, top_y) of the hitbox.
+        """
+        hit_box = self.__hit_box
+        return hit_box.get_left_x(), hit_box.get_bottom_y(), hit_box.get_right_x(), hit_box.get_top_y()
 
 
 class Rectangle:
@@ -123,7 +216,9 @@ class Rectangle:
     - get_right_x(): Returns the rightmost x-coordinate.
     - get_top_y(): Returns the highest y-coordinate.
     - get_bottom_y(): Returns the lowest y-coordinate.
+    - set_corners(x1, y1, x2, y2): Moves the rectangle in place.
     """
+    @instrument("dragon.Rectangle.overlaps")
     def overlaps(self, rect):
         """
         Determines if this rectangle overlaps with another rectangle.
@@ -152,6 +247,13 @@ class Rectangle:
         self.__x2 = x2
         self.__y2 = y2
 
+    def set_corners(self, x1, y1, x2, y2):
+        """Replaces the corner coordinates of the rectangle in place."""
+        self.__x1 = x1
+        self.__y1 = y1
+        self.__x2 = x2
+        self.__y2 = y2
+
     def get_left_x(self):
         """Returns the leftmost x-coordinate of the rectangle."""
         if self.__x1 < self.__x2:
@@ -177,6 +279,591 @@ class Rectangle:
         return self.__y2
 
 
+class UnitIndex:
+    """
+    Uniform grid index over units and dragons for fast area queries.
+
+    The map is divided into square cells of side `cell_size`. A point unit is stored
+    in the cell containing its position, a dragon in every cell its hitbox touches.
+    A query only visits the cells covered by the queried area, so it costs
+    O(cells + k) instead of a scan over all units.
+
+    Attributes:
+    -----------
+    - cell_size (float): Side length of a grid cell; pick it close to the typical query or dragon size.
+    - __cells (dict): Maps a (column, row) cell to the set of units stored in it.
+    - __unit_cells (dict): Maps an indexed unit to the (col_min, row_min, col_max, row_max) range of its cells.
+
+    Methods:
+    --------
+    - insert(unit): Adds a unit or a dragon to the index.
+    - remove(unit): Removes a previously inserted unit.
+    - update(unit): Re-indexes a unit after it moved; called automatically by Unit.move_to.
+    - query_area(x1, y1, x2, y2): Returns the units whose area overlaps the given rectangle.
+    """
+
+    def __init__(self, cell_size, units=()):
+        """
+        Initializes the index.
+
+        Parameters:
+        -----------
+        - cell_size (float): Side length of a grid cell, must be positive.
+        - units (iterable): Units to insert right away.
+        """
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+        self.__cells = {}
+        self.__unit_cells = {}
+        for unit in units:
+            self.insert(unit)
+
+    def __len__(self):
+        return len(self.__unit_cells)
+
+    def __contains__(self, unit):
+        return unit in self.__unit_cells
+
+    def insert(self, unit):
+        """
+        Adds a unit to the index.
+
+        Parameters:
+        -----------
+        - unit (Unit): The unit or dragon to index.
+
+        Raises:
+        -------
+        - ValueError: If the unit is already indexed.
+        """
+        if unit in self.__unit_cells:
+            raise ValueError(f"unit '{unit.name}' is already indexed")
+        cell_range = self.__cell_range(*unit.get_bounds())
+        self.__unit_cells[unit] = cell_range
+        self.__add_to_cells(unit, cell_range)
+        unit.add_listener(self)
+
+    def remove(self, unit):
+        """
+        Removes a unit from the index.
+
+        Parameters:
+        -----------
+        - unit (Unit): A unit previously passed to insert.
+
+        Raises:
+        -------
+        - KeyError: If the unit is not indexed.
+        """
+        self.__remove_from_cells(unit, self.__unit_cells.pop(unit))
+        unit.remove_listener(self)
+
+    def update(self, unit):
+        """
+        Re-indexes a unit whose position changed.
+
+        Only the cells the unit left or entered are touched; a move within the same cells
+        costs a single bounds computation.
+
+        Parameters:
+        -----------
+        - unit (Unit): An indexed unit.
+        """
+        old_range = self.__unit_cells[unit]
+        new_range = self.__cell_range(*unit.get_bounds())
+        if new_range == old_range:
+            return
+        self.__remove_from_cells(unit, old_range)
+        self.__add_to_cells(unit, new_range)
+        self.__unit_cells[unit] = new_range
+
+    def query_area(self, x1, y1, x2, y2):
+        """
+        Finds the units located in a rectangular area.
+
+        Uses the same semantics as Unit.in_area/Dragon.in_area, including touching edges.
+
+        Parameters:
+        -----------
+        - x1, y1 (float): Coordinates of one corner of the area.
+        - x2, y2 (float): Coordinates of the opposite corner of the area.
+
+        Returns:
+        --------
+        - list: The units inside (or, for dragons, overlapping) the area.
+        """
+        q_col_min, q_row_min, q_col_max, q_row_max = self.__cell_range(
+            min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        if (q_col_max - q_col_min + 1) * (q_row_max - q_row_min + 1) > len(self.__cells):
+            cells = [(key, units) for key, units in self.__cells.items()
+                     if q_col_min <= key[0] <= q_col_max and q_row_min <= key[1] <= q_row_max]
+        else:
+            cells = [((col, row), self.__cells[(col, row)])
+                     for col in range(q_col_min, q_col_max + 1)
+                     for row in range(q_row_min, q_row_max + 1)
+                     if (col, row) in self.__cells]
+        found = []
+        for (col, row), units in cells:
+            for unit in units:
+                u_col_min, u_row_min, _, _ = self.__unit_cells[unit]
+                # a unit spanning several cells is only reported from the first cell shared with the query
+                if col != max(u_col_min, q_col_min) or row != max(u_row_min, q_row_min):
+                    continue
+                if unit.in_area(x1, y1, x2, y2):
+                    found.append(unit)
+        return found
+
+    def __add_to_cells(self, unit, cell_range):
+        col_min, row_min, col_max, row_max = cell_range
+        for col in range(col_min, col_max + 1):
+            for row in range(row_min, row_max + 1):
+                self.__cells.setdefault((col, row), set()).add(unit)
+
+    def __remove_from_cells(self, unit, cell_range):
+        col_min, row_min, col_max, row_max = cell_range
+        for col in range(col_min, col_max + 1):
+            for row in range(row_min, row_max + 1):
+                cell = self.__cells[(col, row)]
+                cell.discard(unit)
+                if not cell:
+                    del self.__cells[(col, row)]
+
+    def __cell_range(self, left_x, bottom_y, right_x, top_y):
+        """Returns the (col_min, row_min, col_max, row_max) range of cells covering a bounding box."""
+        size = self.cell_size
+        return (math.floor(left_x / size), math.floor(bottom_y / size),
+                math.floor(right_x / size), math.floor(top_y / size))
+
+
+def move_units(units, pos_x, pos_y):
+    """
+    Moves many units at once, e.g. once per simulation tick.
+
+    Parameters:
+    -----------
+    - units (sequence of Unit): The units to move.
+    - pos_x, pos_y (sequence of float): New positions, aligned with `units`.
+    """
+    for unit, x, y in zip(units, pos_x, pos_y, strict=True):
+        unit.move_to(x, y)
+
+
+@instrument("dragon.find_overlapping_dragons")
+def find_overlapping_dragons(dragons):
+    """
+    Finds every pair of dragons whose hitboxes overlap (broad-phase collision detection).
+
+    Sweep and prune: hitboxes are sorted by their left edge and swept along the x axis
+    while a heap keeps the "active" hitboxes whose right edge has not been passed yet.
+    Only active hitboxes can overlap the current one on x, so the y test runs against
+    them alone, which gives roughly O(n log n + k) instead of O(n^2) overlaps calls.
+
+    Parameters:
+    -----------
+    - dragons (iterable of Dragon): The dragons to test against each other.
+
+    Returns:
+    --------
+    - list: (Dragon, Dragon) tuples, one per overlapping pair, the dragon that comes first
+      in `dragons` being first in the tuple. Touching edges count as an overlap, exactly like
+      Rectangle.overlaps.
+    """
+    dragons = list(dragons)
+    bounds = [dragon.get_bounds() for dragon in dragons]
+    order = sorted(range(len(dragons)), key=lambda i: bounds[i][0])
+    active = []
+    pairs = []
+    for i in order:
+        left_x, bottom_y, right_x, top_y = bounds[i]
+        while active and active[0][0] < left_x:
+            heapq.heappop(active)
+        for _, j in active:
+            _, other_bottom_y, _, other_top_y = bounds[j]
+            if bottom_y <= other_top_y and top_y >= other_bottom_y:
+                pairs.append((dragons[j], dragons[i]) if j < i else (dragons[i], dragons[j]))
+        heapq.heappush(active, (right_x, i))
+    return pairs
+
+
+class RectangleArray:
+    """
+    Struct-of-arrays collection of rectangles backed by NumPy.
+
+    Each rectangle is stored as four normalized float64 columns, i.e. 32 bytes per rectangle,
+    and overlap tests against one or many areas run as a single vectorized expression with
+    the same semantics as Rectangle.overlaps (touching edges overlap).
+
+    Attributes:
+    -----------
+    - left_x, right_x (numpy.ndarray): The leftmost and rightmost x-coordinates.
+    - bottom_y, top_y (numpy.ndarray): The lowest and highest y-coordinates.
+
+    Methods:
+    --------
+    - from_rectangles(rectangles): Builds the array from Rectangle objects.
+    - overlaps(x1, y1, x2, y2): Boolean mask of rectangles overlapping one area.
+    - overlaps_many(areas): Boolean (len(areas), len(self)) matrix of overlaps.
+    """
+
+    def __init__(self, x1, y1, x2, y2):
+        """
+        Initializes the array from corner coordinates, one entry per rectangle.
+
+        Parameters:
+        -----------
+        - x1, y1 (array_like): Coordinates of the first corners.
+        - x2, y2 (array_like): Coordinates of the opposite corners.
+        """
+        x1, y1, x2, y2 = (np.asarray(column, dtype=np.float64) for column in (x1, y1, x2, y2))
+        self.left_x = np.minimum(x1, x2)
+        self.right_x = np.maximum(x1, x2)
+        self.bottom_y = np.minimum(y1, y2)
+        self.top_y = np.maximum(y1, y2)
+
+    @classmethod
+    def from_rectangles(cls, rectangles):
+        """Builds the array from an iterable of Rectangle objects."""
+        bounds = np.array([(rect.get_left_x(), rect.get_bottom_y(), rect.get_right_x(), rect.get_top_y())
+                           for rect in rectangles], dtype=np.float64).reshape(-1, 4)
+        return cls(bounds[:, 0], bounds[:, 1], bounds[:, 2], bounds[:, 3])
+
+    def __len__(self):
+        return len(self.left_x)
+
+    def __getitem__(self, index):
+        """Returns the rectangle at `index` as a Rectangle object."""
+        return Rectangle(self.left_x[index], self.bottom_y[index], self.right_x[index], self.top_y[index])
+
+    @property
+    def nbytes(self):
+        """Memory used by the coordinate columns, in bytes."""
+        return self.left_x.nbytes + self.right_x.nbytes + self.bottom_y.nbytes + self.top_y.nbytes
+
+    def overlaps(self, x1, y1, x2, y2):
+        """
+        Tests every rectangle against one area.
+
+        Parameters:
+        -----------
+        - x1, y1 (float): Coordinates of one corner of the area.
+        - x2, y2 (float): Coordinates of the opposite corner of the area.
+
+        Returns:
+        --------
+        - numpy.ndarray: Boolean mask, True for rectangles overlapping the area.
+        """
+        return (
+                (self.left_x <= max(x1, x2))
+                & (self.right_x >= min(x1, x2))
+                & (self.top_y >= min(y1, y2))
+                & (self.bottom_y <= max(y1, y2))
+        )
+
+    def overlaps_many(self, areas):
+        """
+        Tests every rectangle against every area.
+
+        Parameters:
+        -----------
+        - areas (RectangleArray): The N areas to test.
+
+        Returns:
+        --------
+        - numpy.ndarray: Boolean matrix of shape (N, len(self)); entry [i, j] tells whether
+          area i overlaps rectangle j.
+        """
+        return (
+                (self.left_x <= areas.right_x[:, np.newaxis])
+                & (self.right_x >= areas.left_x[:, np.newaxis])
+                & (self.top_y >= areas.bottom_y[:, np.newaxis])
+                & (self.bottom_y <= areas.top_y[:, np.newaxis])
+        )
+
+
+class DragonArray:
+    """
+    Struct-of-arrays collection of dragons backed by NumPy.
+
+    Attributes:
+    -----------
+    - pos_x, pos_y (numpy.ndarray): Centers of the dragons.
+    - height, width (numpy.ndarray): Sizes of the dragons.
+    - fire_range (numpy.ndarray): Fire ranges of the dragons.
+    - hit_boxes (RectangleArray): Hitboxes computed from positions and sizes.
+
+    Methods:
+    --------
+    - from_dragons(dragons): Builds the array from Dragon objects.
+    - in_area(x1, y1, x2, y2): Boolean mask of dragons whose hitbox overlaps an area.
+    - move_to(indices, pos_x, pos_y): Moves selected dragons and their hitboxes in place.
+    """
+
+    def __init__(self, pos_x, pos_y, height, width, fire_range):
+        """
+        Initializes the array, one entry per dragon.
+
+        Parameters:
+        -----------
+        - pos_x, pos_y (array_like): Centers of the dragons' hitboxes.
+        - height, width (array_like): Sizes of the dragons.
+        - fire_range (array_like): Fire ranges of the dragons.
+        """
+        self.pos_x = np.asarray(pos_x, dtype=np.float64)
+        self.pos_y = np.asarray(pos_y, dtype=np.float64)
+        self.height = np.asarray(height, dtype=np.float64)
+        self.width = np.asarray(width, dtype=np.float64)
+        self.fire_range = np.asarray(fire_range, dtype=np.float64)
+        self.hit_boxes = RectangleArray(self.pos_x - self.width / 2, self.pos_y - self.height / 2,
+                                        self.pos_x + self.width / 2, self.pos_y + self.height / 2)
+
+    @classmethod
+    def from_dragons(cls, dragons):
+        """Builds the array from an iterable of Dragon objects."""
+        columns = np.array([(dragon.pos_x, dragon.pos_y, dragon.height, dragon.width, dragon.fire_range)
+                            for dragon in dragons], dtype=np.float64).reshape(-1, 5)
+        return cls(*columns.T)
+
+    def __len__(self):
+        return len(self.pos_x)
+
+    def in_area(self, x1, y1, x2, y2):
+        """
+        Determines which dragons' hitboxes overlap a given rectangular area.
+
+        Parameters:
+        -----------
+        - x1, y1 (float): Coordinates of one corner of the area.
+        - x2, y2 (float): Coordinates of the opposite corner of the area.
+
+        Returns:
+        --------
+        - numpy.ndarray: Boolean mask, True where Dragon.in_area would return True.
+        """
+        return self.hit_boxes.overlaps(x1, y1, x2, y2)
+
+    def move_to(self, indices, pos_x, pos_y):
+        """
+        Moves selected dragons, updating only their entries of the hitbox columns.
+
+        Parameters:
+        -----------
+        - indices (array_like): Indices (or a boolean mask) of the dragons to move.
+        - pos_x, pos_y (array_like): The new centers, broadcast against `indices`.
+        """
+        self.pos_x[indices] = pos_x
+        self.pos_y[indices] = pos_y
+        half_width = self.width[indices] / 2
+        half_height = self.height[indices] / 2
+        hit_boxes = self.hit_boxes
+        hit_boxes.left_x[indices] = self.pos_x[indices] - half_width
+        hit_boxes.right_x[indices] = self.pos_x[indices] + half_width
+        hit_boxes.bottom_y[indices] = self.pos_y[indices] - half_height
+        hit_boxes.top_y[indices] = self.pos_y[indices] + half_height
+
+
+class FireRangeIndex:
+    """
+    Bucketed grid over unit positions for batched radius and nearest-neighbour queries.
+
+    Positions are sorted by grid cell, so the points of one grid column inside a row range
+    form a single contiguous slice found with searchsorted. With `cell_size` equal to the
+    largest queried radius every query touches at most 3 x 3 cells, and whole batches of
+    queries are answered with vectorized NumPy code.
+
+    Results are compact index arrays in CSR form: the units matched by query i are
+    `indices[offsets[i]:offsets[i + 1]]`, as positions in the sequence the index was built from.
+
+    Attributes:
+    -----------
+    - cell_size (float): Side length of a grid cell.
+    - pos_x, pos_y (numpy.ndarray): The indexed positions, in input order.
+
+    Methods:
+    --------
+    - from_units(units, cell_size): Builds the index over Unit positions.
+    - query_radius(center_x, center_y, radius): Units within a radius of every center.
+    - query_fire_range(dragons): Units within fire range of every dragon.
+    - query_nearest(center_x, center_y, k): The k nearest units of every center.
+    """
+
+    def __init__(self, pos_x, pos_y, cell_size):
+        """
+        Initializes the index.
+
+        Parameters:
+        -----------
+        - pos_x, pos_y (array_like): Positions of the indexed units.
+        - cell_size (float): Side length of a grid cell, ideally the largest fire range queried.
+        """
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = float(cell_size)
+        self.pos_x = np.asarray(pos_x, dtype=np.float64)
+        self.pos_y = np.asarray(pos_y, dtype=np.float64)
+        self.__origin_x = self.pos_x.min() if len(self.pos_x) else 0.0
+        self.__origin_y = self.pos_y.min() if len(self.pos_y) else 0.0
+        cols = self.__cells(self.pos_x, self.__origin_x)
+        rows = self.__cells(self.pos_y, self.__origin_y)
+        self.__n_cols = int(cols.max()) + 1 if len(cols) else 0
+        self.__n_rows = int(rows.max()) + 1 if len(rows) else 0
+        keys = cols * self.__n_rows + rows
+        self.__order = np.argsort(keys, kind="stable")
+        self.__sorted_keys = keys[self.__order]
+        self.__sorted_x = self.pos_x[self.__order]
+        self.__sorted_y = self.pos_y[self.__order]
+
+    @classmethod
+    def from_units(cls, units, cell_size):
+        """Builds the index over the positions of an iterable of Unit objects."""
+        positions = np.array([(unit.pos_x, unit.pos_y) for unit in units], dtype=np.float64).reshape(-1, 2)
+        return cls(positions[:, 0], positions[:, 1], cell_size)
+
+    def __len__(self):
+        return len(self.pos_x)
+
+    def query_radius(self, center_x, center_y, radius, chunk_size=4096):
+        """
+        Finds the units within a radius (inclusive) of every center.
+
+        Parameters:
+        -----------
+        - center_x, center_y (array_like): The query centers.
+        - radius (float or array_like): The radius, shared or one per center.
+        - chunk_size (int): Number of centers processed per vectorized step; bounds temporary memory.
+
+        Returns:
+        --------
+        - tuple: (offsets, indices) int64 arrays in CSR form.
+        """
+        center_x = np.atleast_1d(np.asarray(center_x, dtype=np.float64))
+        center_y = np.atleast_1d(np.asarray(center_y, dtype=np.float64))
+        radius = np.broadcast_to(np.asarray(radius, dtype=np.float64), center_x.shape)
+        counts = np.zeros(len(center_x), dtype=np.int64)
+        chunks = []
+        for start in range(0, len(center_x), chunk_size):
+            stop = start + chunk_size
+            query, points = self.__query_chunk(center_x[start:stop], center_y[start:stop], radius[start:stop])
+            counts[start:stop] = np.bincount(query, minlength=len(center_x[start:stop]))
+            chunks.append(self.__order[points])
+        offsets = np.zeros(len(center_x) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        indices = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
+        return offsets, indices
+
+    def query_fire_range(self, dragons):
+        """
+        Finds the units within fire range of every dragon, measured from the dragon's center.
+
+        Parameters:
+        -----------
+        - dragons (DragonArray or iterable of Dragon): The attacking dragons.
+
+        Returns:
+        --------
+        - tuple: (offsets, indices) int64 arrays in CSR form, one row per dragon.
+        """
+        if not isinstance(dragons, DragonArray):
+            dragons = DragonArray.from_dragons(dragons)
+        return self.query_radius(dragons.pos_x, dragons.pos_y, dragons.fire_range)
+
+    def query_nearest(self, center_x, center_y, k, chunk_size=4096):
+        """
+        Finds the k nearest units of every center.
+
+        Rings of cells around the center's cell are added until the k-th best distance is
+        guaranteed not to be beaten by a point outside the searched square. All unresolved
+        centers of a chunk grow their ring together in one vectorized step.
+
+        Parameters:
+        -----------
+        - center_x, center_y (array_like): The query centers.
+        - k (int): Number of neighbours to return.
+        - chunk_size (int): Number of centers processed per vectorized step; bounds temporary memory.
+
+        Returns:
+        --------
+        - tuple: (indices, distances) arrays of shape (len(centers), k), nearest first. Rows are
+          padded with -1 and inf when fewer than k units are indexed.
+        """
+        center_x = np.atleast_1d(np.asarray(center_x, dtype=np.float64))
+        center_y = np.atleast_1d(np.asarray(center_y, dtype=np.float64))
+        indices = np.full((len(center_x), k), -1, dtype=np.int64)
+        distances = np.full((len(center_x), k), np.inf)
+        if len(self) == 0 or k <= 0:
+            return indices, distances
+        for start in range(0, len(center_x), chunk_size):
+            stop = start + chunk_size
+            self.__nearest_chunk(center_x[start:stop], center_y[start:stop], k,
+                                 indices[start:stop], distances[start:stop])
+        return indices, distances
+
+    def __nearest_chunk(self, center_x, center_y, k, indices, distances):
+        """Fills the rows of `indices` and `distances` (views) for a chunk of nearest queries."""
+        col = self.__cells(center_x, self.__origin_x)
+        row = self.__cells(center_y, self.__origin_y)
+        active = np.arange(len(center_x))
+        ring = 0
+        while len(active):
+            col_lo, col_hi = col[active] - ring, col[active] + ring
+            row_lo, row_hi = row[active] - ring, row[active] + ring
+            covers_grid = ((col_lo <= 0) & (row_lo <= 0)
+                           & (col_hi >= self.__n_cols - 1) & (row_hi >= self.__n_rows - 1))
+            query, points = self.__points_in_cells(col_lo, row_lo, col_hi, row_hi)
+            found = np.hypot(self.__sorted_x[points] - center_x[active][query],
+                             self.__sorted_y[points] - center_y[active][query])
+            # nearest first within each center; lexsort is stable, so ties keep the grid order
+            order = np.lexsort((found, query))
+            query, points, found = query[order], points[order], found[order]
+            counts = np.bincount(query, minlength=len(active))
+            firsts = np.cumsum(counts) - counts
+            rank = np.arange(len(query)) - np.repeat(firsts, counts)
+            kth = np.full(len(active), np.inf)
+            full = counts >= k
+            kth[full] = found[firsts[full] + k - 1]
+            done = covers_grid | (kth <= ring * self.cell_size)
+            keep = (rank < k) & done[query]
+            rows = active[query[keep]]
+            indices[rows, rank[keep]] = self.__order[points[keep]]
+            distances[rows, rank[keep]] = found[keep]
+            active = active[~done]
+            ring += 1
+
+    def __query_chunk(self, center_x, center_y, radius):
+        """Returns aligned (query, sorted point) position arrays of all matches for a chunk of centers."""
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        query, points = self.__points_in_cells(self.__cells(center_x - radius, self.__origin_x),
+                                               self.__cells(center_y - radius, self.__origin_y),
+                                               self.__cells(center_x + radius, self.__origin_x),
+                                               self.__cells(center_y + radius, self.__origin_y))
+        inside = (np.hypot(self.__sorted_x[points] - center_x[query], self.__sorted_y[points] - center_y[query])
+                  <= radius[query])
+        return query[inside], points[inside]
+
+    def __points_in_cells(self, col_lo, row_lo, col_hi, row_hi):
+        """Returns aligned (query, sorted point) position arrays of the points inside each query's square of cells."""
+        col_lo, row_lo = np.clip(col_lo, 0, None), np.clip(row_lo, 0, None)
+        col_hi, row_hi = np.clip(col_hi, None, self.__n_cols - 1), np.clip(row_hi, None, self.__n_rows - 1)
+        empty = (col_lo > col_hi) | (row_lo > row_hi)
+        span = int((col_hi - col_lo)[~empty].max()) + 1 if not empty.all() else 0
+        # one contiguous slice of the sorted points per (center, column) pair
+        cols = col_lo[:, np.newaxis] + np.arange(span)
+        valid = (cols <= col_hi[:, np.newaxis]) & ~empty[:, np.newaxis]
+        lo = np.searchsorted(self.__sorted_keys, cols * self.__n_rows + row_lo[:, np.newaxis], side="left")
+        hi = np.searchsorted(self.__sorted_keys, cols * self.__n_rows + row_hi[:, np.newaxis], side="right")
+        sizes = np.where(valid, hi - lo, 0).ravel()
+        starts = lo.ravel()
+        query = np.repeat(np.repeat(np.arange(len(col_lo)), span), sizes)
+        # position inside each slice: global arange minus the start of the slice in the output
+        slice_offsets = np.cumsum(sizes) - sizes
+        points = np.repeat(starts - slice_offsets, sizes) + np.arange(sizes.sum())
+        return query, points
+
+    def __cells(self, coordinate, origin):
+        return np.floor((coordinate - origin) / self.cell_size).astype(np.int64)
+
+
 if __name__ == '__main__':
     run_cases = [
         (Dragon("Green Dragon", -1, -2, 1, 2, 1), -2, -3, 0, 0, True),
@@ -0,0 +1,258 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from dragon import DragonArray, FireRangeIndex, RectangleArray
+
+# column layout of the shared float64 block: dragons, then units, then query areas
+_DRAGON_COLUMNS = ("pos_x", "pos_y", "height", "width", "fire_range")
+_AREA_COLUMNS = ("left_x", "bottom_y", "right_x", "top_y")
+
+# number of dragons and units per tile the default tiling aims for
+_ENTITIES_PER_TILE = 1024
+
+# arrays attached from shared memory in a worker process, set up by _attach_shared_world
+_worker_world = None
+_worker_memory = None
+
+
+class SimulationStepResult:
+    """
+    Merged results of one simulation step.
+
+    Attributes:
+    -----------
+    - collisions (numpy.ndarray): (k, 2) int64 array of overlapping dragon index pairs, i < j, sorted.
+    - fire_offsets, fire_indices (numpy.ndarray): CSR arrays; the units within fire range of dragon i
+      are fire_indices[fire_offsets[i]:fire_offsets[i + 1]].
+    - area_offsets, area_indices (numpy.ndarray): CSR arrays; the units inside query area i
+      are area_indices[area_offsets[i]:area_offsets[i + 1]].
+    """
+
+    def __init__(self, collisions, fire_offsets, fire_indices, area_offsets, area_indices):
+        self.collisions = collisions
+        self.fire_offsets = fire_offsets
+        self.fire_indices = fire_indices
+        self.area_offsets = area_offsets
+        self.area_indices = area_indices
+
+
+def simulation_step(dragons, unit_x, unit_y, areas=None, tile_size=None, workers=None):
+    """
+    Runs collision, fire-range and area queries for a whole world, tile by tile.
+
+    The map is cut into square tiles. Every dragon and unit is owned by the tile containing its
+    center, and each tile also sees the neighbouring tiles within a halo as wide as the largest
+    dragon extent or fire range, which is the farthest any interaction can reach. A result is
+    only reported by the tile owning it (a collision by the owner of its lower-indexed dragon, a
+    fire hit by the dragon's owner, an area hit by the unit's owner), so merging needs no
+    deduplication.
+
+    Dragons and units are sorted by tile once, so a tile and its halo are a few contiguous slices
+    found with searchsorted, and a step costs O(N log N) overall rather than a pass over the
+    whole world per tile. Tiles owning nothing are skipped.
+
+    With `workers` set, tiles are processed in a process pool. The world is copied once into a
+    shared memory block that workers attach to, instead of pickling it for every task.
+
+    Parameters:
+    -----------
+    - dragons (DragonArray): The dragons of the world.
+    - unit_x, unit_y (array_like): Positions of the point units targeted by fire and area queries.
+    - areas (RectangleArray, optional): Query areas; units inside each one are reported.
+    - tile_size (float, optional): Side length of a tile; by default chosen from the world size,
+      the number of entities and the number of workers.
+    - workers (int, optional): Number of worker processes; by default tiles run in this process.
+
+    Returns:
+    --------
+    - SimulationStepResult: The merged results, identical for any number of workers.
+    """
+    unit_x = np.asarray(unit_x, dtype=np.float64)
+    unit_y = np.asarray(unit_y, dtype=np.float64)
+    if areas is None:
+        areas = RectangleArray(np.zeros(0), np.zeros(0), np.zeros(0), np.zeros(0))
+    dragon_columns = np.stack([getattr(dragons, column) for column in _DRAGON_COLUMNS]).reshape(5, -1)
+    unit_columns = np.stack([unit_x, unit_y]).reshape(2, -1)
+    halo = _halo(dragons)
+    grid = _grid(dragon_columns, unit_columns, tile_size, halo, workers)
+    dragon_keys, dragon_order = _sort_by_tile(dragon_columns, grid)
+    unit_keys, unit_order = _sort_by_tile(unit_columns, grid)
+    world = {
+        "dragons": dragon_columns[:, dragon_order],
+        "units": unit_columns[:, unit_order],
+        "areas": np.stack([getattr(areas, column) for column in _AREA_COLUMNS]).reshape(4, -1),
+        "dragon_keys": dragon_keys,
+        "unit_keys": unit_keys,
+    }
+    tiles = np.union1d(dragon_keys, unit_keys).astype(np.int64).tolist()
+
+    if not workers or workers == 1 or len(tiles) <= 1:
+        partials = [_process_tile(world, grid, tile, halo) for tile in tiles]
+    else:
+        memory, layout = _share_world(world)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach_shared_world,
+                                     initargs=(memory.name, layout)) as executor:
+                partials = list(executor.map(_process_shared_tile, [grid] * len(tiles), tiles,
+                                             [halo] * len(tiles),
+                                             chunksize=max(1, len(tiles) // (4 * workers))))
+        finally:
+            memory.close()
+            memory.unlink()
+    return _merge(partials, dragon_order, unit_order, len(dragons), world["areas"].shape[1])
+
+
+def _halo(dragons):
+    """Returns the farthest reach of any interaction: the largest dragon extent or fire range."""
+    if len(dragons) == 0:
+        return 1.0
+    reach = max(dragons.width.max(), dragons.height.max(), dragons.fire_range.max())
+    return float(reach) if reach > 0 else 1.0
+
+
+def _grid(dragon_columns, unit_columns, tile_size, halo, workers):
+    """
+    Returns the tiling (min_x, min_y, tile_size, n_cols, n_rows, ring) covering every dragon and
+    unit center; `ring` is the number of neighbouring tiles a halo can reach in each direction.
+    """
+    xs = np.concatenate([dragon_columns[0], unit_columns[0]])
+    ys = np.concatenate([dragon_columns[1], unit_columns[1]])
+    if len(xs) == 0:
+        return 0.0, 0.0, float(tile_size or halo), 1, 1, 1
+    min_x, min_y = float(xs.min()), float(ys.min())
+    width, height = float(xs.max()) - min_x, float(ys.max()) - min_y
+    if not tile_size:
+        # enough tiles to keep every worker busy and the per-tile pairwise work small, but never
+        # narrower than the halo, so a tile only looks at its direct neighbours
+        n_tiles = max(4 * (workers or 1), len(xs) // _ENTITIES_PER_TILE, 1)
+        tile_size = max(math.sqrt(width * height / n_tiles), max(width, height) / n_tiles, halo)
+    n_cols = int(width // tile_size) + 1
+    n_rows = int(height // tile_size) + 1
+    return min_x, min_y, float(tile_size), n_cols, n_rows, math.ceil(halo / tile_size)
+
+
+def _sort_by_tile(columns, grid):
+    """Returns the sorted tile keys (col * n_rows + row) of the centers in `columns` and their order."""
+    min_x, min_y, tile_size, n_cols, n_rows, _ = grid
+    cols = np.clip((columns[0] - min_x) // tile_size, 0, n_cols - 1)
+    rows = np.clip((columns[1] - min_y) // tile_size, 0, n_rows - 1)
+    keys = cols * n_rows + rows
+    order = np.argsort(keys, kind="stable")
+    return keys[order], order
+
+
+def _owned(keys, tile):
+    """Returns the positions of the entities owned by `tile` in the tile-sorted `keys`."""
+    return np.arange(np.searchsorted(keys, tile, "left"), np.searchsorted(keys, tile, "right"))
+
+
+def _neighbourhood(keys, grid, tile):
+    """Returns the positions of the entities in `tile` and in the tiles within its halo ring."""
+    _, _, _, n_cols, n_rows, ring = grid
+    col, row = divmod(tile, n_rows)
+    low_row, high_row = max(0, row - ring), min(n_rows - 1, row + ring)
+    # the rows of one column form a contiguous key range
+    slices = [np.arange(np.searchsorted(keys, c * n_rows + low_row, "left"),
+                        np.searchsorted(keys, c * n_rows + high_row, "right"))
+              for c in range(max(0, col - ring), min(n_cols, col + ring + 1))]
+    return np.concatenate(slices)
+
+
+def _process_tile(world, grid, tile, halo):
+    """
+    Computes the results owned by one tile.
+
+    Returns (collisions, fire, area_hits) as (k, 2) int64 arrays of index pairs into the
+    tile-sorted dragons and units of `world` (area indices are unchanged).
+    """
+    dragons, units, areas = world["dragons"], world["units"], world["areas"]
+    owned = _owned(world["dragon_keys"], tile)
+    empty = np.zeros((0, 2), dtype=np.int64)
+
+    collisions = fire = empty
+    if len(owned):
+        nearby = _neighbourhood(world["dragon_keys"], grid, tile)
+        owned_dragons = DragonArray(*dragons[:, owned])
+        nearby_dragons = DragonArray(*dragons[:, nearby])
+        hits = nearby_dragons.hit_boxes.overlaps_many(owned_dragons.hit_boxes)
+        rows, cols = np.nonzero(hits)
+        pairs = np.stack([owned[rows], nearby[cols]], axis=1)
+        collisions = pairs[pairs[:, 0] < pairs[:, 1]]
+
+        targets = _neighbourhood(world["unit_keys"], grid, tile)
+        if len(targets):
+            index = FireRangeIndex(units[0, targets], units[1, targets], halo)
+            offsets, indices = index.query_radius(owned_dragons.pos_x, owned_dragons.pos_y, owned_dragons.fire_range)
+            fire = np.stack([np.repeat(owned, np.diff(offsets)), targets[indices]], axis=1)
+
+    area_hits = empty
+    owned_units = _owned(world["unit_keys"], tile)
+    if len(owned_units) and areas.shape[1]:
+        left_x, bottom_y, right_x, top_y = (column[:, np.newaxis] for column in areas)
+        ox, oy = units[0, owned_units], units[1, owned_units]
+        area_rows, unit_cols = np.nonzero((left_x <= ox) & (ox <= right_x) & (bottom_y <= oy) & (oy <= top_y))
+        area_hits = np.stack([area_rows, owned_units[unit_cols]], axis=1)
+    return collisions, fire, area_hits
+
+
+def _merge(partials, dragon_order, unit_order, n_dragons, n_areas):
+    """Maps per-tile results back to input indices and concatenates them into a SimulationStepResult."""
+    collisions, fire, area_hits = ([partial[part] for partial in partials] for part in range(3))
+    collisions = dragon_order[_concatenate(collisions)]
+    collisions = _sorted_pairs(np.sort(collisions, axis=1))
+    fire = _concatenate(fire)
+    fire = _sorted_pairs(np.stack([dragon_order[fire[:, 0]], unit_order[fire[:, 1]]], axis=1))
+    area_hits = _concatenate(area_hits)
+    area_hits = _sorted_pairs(np.stack([area_hits[:, 0], unit_order[area_hits[:, 1]]], axis=1))
+    return SimulationStepResult(collisions,
+                                _csr_offsets(fire[:, 0], n_dragons), fire[:, 1],
+                                _csr_offsets(area_hits[:, 0], n_areas), area_hits[:, 1])
+
+
+def _concatenate(chunks):
+    return np.concatenate(chunks) if chunks else np.zeros((0, 2), dtype=np.int64)
+
+
+def _sorted_pairs(pairs):
+    return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+
+def _csr_offsets(rows, n_rows):
+    offsets = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=offsets[1:])
+    return offsets
+
+
+def _share_world(world):
+    """Copies the world arrays into one shared memory block; returns it with its layout."""
+    layout = {}
+    offset = 0
+    for name, array in world.items():
+        layout[name] = (offset, array.shape)
+        offset += array.size
+    memory = SharedMemory(create=True, size=max(offset, 1) * 8)
+    block = np.ndarray((offset,), dtype=np.float64, buffer=memory.buf)
+    for name, array in world.items():
+        start, _ = layout[name]
+        block[start:start + array.size] = array.ravel()
+    return memory, layout
+
+
+def _attach_shared_world(name, layout):
+    """Worker initializer: maps the shared world into read-only arrays once per process."""
+    global _worker_world, _worker_memory
+    _worker_memory = SharedMemory(name=name)
+    block = np.ndarray((sum(np.prod(shape) for _, shape in layout.values()),), dtype=np.float64,
+                       buffer=_worker_memory.buf)
+    _worker_world = {}
+    for key, (start, shape) in layout.items():
+        view = block[start:start + int(np.prod(shape))].reshape(shape)
+        view.flags.writeable = False
+        _worker_world[key] = view
+
+
+def _process_shared_tile(grid, tile, halo):
+    return _process_tile(_worker_world, grid, tile, halo)
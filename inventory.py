@@ -1,53 +1,639 @@
+import asyncio
+import bisect
+import functools
+import heapq
+import itertools
+import logging
+import threading
+from array import array
+from collections.abc import Mapping
+
 from logger import logger
+from metrics import increment, instrument
+
+# target number of entries per block of a _SortedList
+_BLOCK_SIZE = 1000
 
 
 class Inventory:
     def __init__(self, max_capacity):
         self.__max_capacity = max_capacity
-        self.items = {}
         self.item_count = 0
+        self.__sequence = 0
+        self._init_storage()
+        # price index entries are ordered by (price, sequence): range queries are two bisections
+        # and items of equal price come in insertion order; stock index entries are ordered by
+        # (quantity, -sequence): the last one is the most stocked item, the negated insertion
+        # sequence makes the earliest added item win ties
+        self.__price_index, self.__stock_index = self._new_indices()
 
+    @instrument("inventory.Inventory.add_item")
     def add_item(self, name, price, quantity):
-        if name in self.items:
-            logger.info(f"Item with name '{name}' already exists")
+        if self._has_item(name):
+            logger.info("Item with name '%s' already exists", name)
+            increment("inventory.add_item.duplicate")
             return False
 
         if self.item_count + quantity > self.__max_capacity:
             logger.info("Max capacity reached. Please delete something from the inventory")
+            increment("inventory.add_item.over_capacity")
             return False
-        self.items[name] = {'name': name, 'price': price, 'quantity': quantity}
-        self.item_count += quantity
-        logger.info(f"Item with name '{name}' added to inventory successfully.")
+        self._insert_item(name, price, quantity)
+        logger.info("Item with name '%s' added to inventory successfully.", name)
         return True
 
+    @instrument("inventory.Inventory.delete_item")
     def delete_item(self, name):
-        if name not in self.items:
-            logger.info(f"Item with name '{name}' does not exist")
+        if not self._has_item(name):
+            logger.info("Item with name '%s' does not exist", name)
             return False
-        self.item_count -= self.items[name]['quantity']
-        del self.items[name]
-        logger.info(f"Item with name '{name}' deleted successfully.")
+        self._remove_item(name)
+        logger.info("Item with name '%s' deleted successfully.", name)
         return True
 
+    @instrument("inventory.Inventory.add_items")
+    def add_items(self, batch):
+        # adds (name, price, quantity) tuples and logs a single summary; capacity is checked once
+        # for the whole batch, which is rejected as a whole when it does not fit; names already in
+        # the inventory (or repeated in the batch) are skipped; returns the number of items added
+        new_items = []
+        seen = set()
+        skipped = 0
+        for name, price, quantity in batch:
+            if name in seen or self._has_item(name):
+                skipped += 1
+                continue
+            seen.add(name)
+            new_items.append((name, price, quantity))
+
+        if self.item_count + sum(quantity for _, _, quantity in new_items) > self.__max_capacity:
+            logger.info("Max capacity reached. Batch of %s items rejected", len(new_items))
+            return 0
+        self._insert_items(new_items)
+        logger.info("%s items added to inventory, %s skipped as duplicates.", len(new_items), skipped)
+        return len(new_items)
+
+    @instrument("inventory.Inventory.delete_items")
+    def delete_items(self, names):
+        # deletes every existing name and logs a single summary; returns the number deleted
+        deleted = []
+        missing = 0
+        for name in names:
+            if self._has_item(name):
+                deleted.append(self.__remove(name))
+            else:
+                missing += 1
+        if deleted:
+            self.__price_index.difference_update(price_entry for _, price_entry, _ in deleted)
+            self.__stock_index.difference_update(stock_entry for _, _, stock_entry in deleted)
+        logger.info("%s items deleted from inventory, %s not found.", len(deleted), missing)
+        return len(deleted)
+
+    @instrument("inventory.Inventory.get_items_in_price_range")
     def get_items_in_price_range(self, min_price, max_price):
-        results = []
-        for item_name in self.items.keys():
-            if min_price <= self.items[item_name]['price'] <= max_price:
-                logger.info(f"Item with name '{item_name}' is within price range")
-                results.append(item_name)
+        results = self.find_items_in_price_range(min_price, max_price)
+        if logger.isEnabledFor(logging.INFO):
+            for item_name in results:
+                logger.info("Item with name '%s' is within price range", item_name)
         return results
 
+    @instrument("inventory.Inventory.find_items_in_price_range")
+    def find_items_in_price_range(self, min_price, max_price):
+        # same as get_items_in_price_range but without per-item logging; names come ordered by price
+        entry_name = self._entry_name
+        return [entry_name(entry) for entry in self.__price_index.irange(min_price, max_price, self._entry_price)]
+
+    @instrument("inventory.Inventory.get_most_stocked_item")
     def get_most_stocked_item(self):
-        max_quantity = 0
-        max_quantity_name = None
-        for item in self.items.values():
-            temp_quantity = item['quantity']
-            temp_quantity_name = item['name']
-            if temp_quantity > max_quantity:
-                max_quantity = temp_quantity
-                max_quantity_name = temp_quantity_name
-                logger.info(f"Most stocked item with name '{temp_quantity_name}' updated")
-        return max_quantity_name
+        if not self.__stock_index:
+            return None
+        entry = next(reversed(self.__stock_index))
+        if self._entry_quantity(entry) <= 0:
+            return None
+        return self._entry_name(entry)
+
+    @instrument("inventory.Inventory.get_most_stocked_items")
+    def get_most_stocked_items(self, k):
+        # names of the k items with the highest quantity, most stocked first
+        if k <= 0:
+            return []
+        return [self._entry_name(entry) for entry in itertools.islice(reversed(self.__stock_index), k)]
+
+    @instrument("inventory.Inventory.get_least_stocked_items")
+    def get_least_stocked_items(self, k):
+        # names of the k items with the lowest quantity, least stocked first;
+        # among equal quantities the most recently added item comes first
+        return [self._entry_name(entry) for entry in itertools.islice(self.__stock_index, max(k, 0))]
+
+    # unchecked, unlogged mutations for callers that did the checks themselves and log outside
+    # their own locks (ConcurrentInventory)
+
+    def _insert_item(self, name, price, quantity):
+        price_entry, stock_entry = self.__insert(name, price, quantity)
+        self.__price_index.add(price_entry)
+        self.__stock_index.add(stock_entry)
+
+    def _insert_items(self, items):
+        # items are (name, price, quantity) tuples with distinct names not in the inventory
+        entries = [self.__insert(name, price, quantity) for name, price, quantity in items]
+        self.__price_index.update(price_entry for price_entry, _ in entries)
+        self.__stock_index.update(stock_entry for _, stock_entry in entries)
+
+    def _remove_item(self, name):
+        # removes an existing item and returns its quantity
+        quantity, price_entry, stock_entry = self.__remove(name)
+        self.__price_index.remove(price_entry)
+        self.__stock_index.remove(stock_entry)
+        return quantity
+
+    def _price_entries(self):
+        # the price index entries, in price order
+        return iter(self.__price_index)
+
+    def _restore(self, price_entries, stock_entries, sequence, item_count):
+        # replaces both indices with entries already in index order (e.g. read back from a
+        # snapshot), so nothing is sorted again
+        self.__price_index, self.__stock_index = self._new_indices()
+        self.__price_index.load_sorted(price_entries)
+        self.__stock_index.load_sorted(stock_entries)
+        self.__sequence = sequence
+        self.item_count = item_count
+
+    def __insert(self, name, price, quantity):
+        self.__sequence += 1
+        self.item_count += quantity
+        return self._store(name, price, quantity, self.__sequence)
+
+    def __remove(self, name):
+        quantity, price_entry, stock_entry = self._discard(name)
+        self.item_count -= quantity
+        return quantity, price_entry, stock_entry
+
+    # storage backend: a dict of item dicts with (price, sequence, name) and
+    # (quantity, -sequence, name) tuples as index entries, overridden by CompactInventory
+
+    def _init_storage(self):
+        self.items = {}
+        self.__sequences = {}
+
+    def _new_indices(self):
+        return _SortedList(), _SortedList()
+
+    def _has_item(self, name):
+        return name in self.items
+
+    def _store(self, name, price, quantity, sequence):
+        # stores an item and returns its (price index, stock index) entries
+        self.items[name] = {'name': name, 'price': price, 'quantity': quantity}
+        self.__sequences[name] = sequence
+        return (price, sequence, name), (quantity, -sequence, name)
+
+    def _discard(self, name):
+        # removes an item and returns its quantity and index entries
+        item = self.items.pop(name)
+        sequence = self.__sequences.pop(name)
+        return item['quantity'], (item['price'], sequence, name), (item['quantity'], -sequence, name)
+
+    def _entry_name(self, entry):
+        return entry[-1]
+
+    def _entry_price(self, price_entry):
+        return price_entry[0]
+
+    def _entry_quantity(self, stock_entry):
+        return stock_entry[0]
+
+
+class CompactInventory(Inventory):
+    # same behaviour as Inventory, but prices and quantities live in typed array columns indexed
+    # by a name -> row dict instead of one dict per item, and both indices hold row numbers in
+    # typed array blocks instead of tuples; rows freed by deletes are reused.
+    # Quantities must be integers. `items` is a read-only view building item dicts on access.
+
+    def _init_storage(self):
+        self.__rows = {}
+        # row -> name, the only way back from an index entry to its item
+        self.__names = []
+        self.__prices = array('d')
+        self.__quantities = array('q')
+        self.__sequences = array('q')
+        self.__free_rows = array('q')
+
+    def _new_indices(self):
+        return _SortedList(key=self.__price_key, typecode='q'), _SortedList(key=self.__stock_key, typecode='q')
+
+    @property
+    def items(self):
+        return _CompactItems(self.__rows, self.__prices, self.__quantities)
+
+    def _has_item(self, name):
+        return name in self.__rows
+
+    def _store(self, name, price, quantity, sequence):
+        if self.__free_rows:
+            row = self.__free_rows.pop()
+            self.__names[row] = name
+            self.__prices[row] = price
+            self.__quantities[row] = quantity
+            self.__sequences[row] = sequence
+        else:
+            row = len(self.__prices)
+            self.__names.append(name)
+            self.__prices.append(price)
+            self.__quantities.append(quantity)
+            self.__sequences.append(sequence)
+        self.__rows[name] = row
+        return row, row
+
+    def _discard(self, name):
+        # the row keeps its values until reused, so the index entries can still be located
+        row = self.__rows.pop(name)
+        self.__names[row] = None
+        self.__free_rows.append(row)
+        return self.__quantities[row], row, row
+
+    def _columns(self):
+        # (name -> row dict in insertion order, prices, quantities, rows in price order)
+        return self.__rows, self.__prices, self.__quantities, self._price_entries()
+
+    def _load_columns(self, names, prices, quantities, price_order, stock_order):
+        # replaces the contents with rows 0..n-1 given in insertion order together with both
+        # index orders, as stored by a snapshot; the columns are taken over without copying
+        self._init_storage()
+        self.__names = names
+        self.__rows = dict(zip(names, range(len(names))))
+        self.__prices = prices
+        self.__quantities = quantities
+        self.__sequences = array('q', range(1, len(names) + 1))
+        self._restore(price_order, stock_order, len(names), sum(quantities))
+
+    def _entry_name(self, row):
+        return self.__names[row]
+
+    def _entry_price(self, row):
+        return self.__prices[row]
+
+    def _entry_quantity(self, row):
+        return self.__quantities[row]
+
+    def __price_key(self, row):
+        return self.__prices[row], self.__sequences[row]
+
+    def __stock_key(self, row):
+        return self.__quantities[row], -self.__sequences[row]
+
+
+class _CompactItems(Mapping):
+    # read-only mapping view of CompactInventory rows in the Inventory.items format
+
+    def __init__(self, rows, prices, quantities):
+        self.__rows = rows
+        self.__prices = prices
+        self.__quantities = quantities
+
+    def __getitem__(self, name):
+        row = self.__rows[name]
+        return {'name': name, 'price': self.__prices[row], 'quantity': self.__quantities[row]}
+
+    def __iter__(self):
+        return iter(self.__rows)
+
+    def __len__(self):
+        return len(self.__rows)
+
+
+class ConcurrentInventory:
+    # thread-safe inventory: items are spread over shards by hash of the name, each shard being an
+    # Inventory guarded by its own lock, so calls on different items rarely contend. Capacity is
+    # reserved atomically under a separate lock while the shard lock is held, which keeps the
+    # check-then-act of add_item race free and item_count exact. Lock order is always shard locks
+    # (ascending) then the capacity lock. Nothing is logged while a lock is held, so lock hold times
+    # never include log formatting or the lazy log file setup. Among items with equal quantity the
+    # stock queries do not guarantee insertion order across shards.
+
+    def __init__(self, max_capacity, shards=16):
+        self.__max_capacity = max_capacity
+        self.__shards = [Inventory(float('inf')) for _ in range(shards)]
+        self.__locks = [threading.Lock() for _ in range(shards)]
+        self.__capacity_lock = threading.Lock()
+        self.__reserved = 0
+
+    @property
+    def item_count(self):
+        return self.__reserved
+
+    @instrument("inventory.ConcurrentInventory.add_item")
+    def add_item(self, name, price, quantity):
+        index = self.__shard_of(name)
+        shard = self.__shards[index]
+        with self.__locks[index]:
+            exists = shard._has_item(name)
+            added = not exists and self.__reserve(quantity)
+            if added:
+                shard._insert_item(name, price, quantity)
+        if exists:
+            logger.info("Item with name '%s' already exists", name)
+        elif not added:
+            logger.info("Max capacity reached. Please delete something from the inventory")
+        else:
+            logger.info("Item with name '%s' added to inventory successfully.", name)
+        return added
+
+    @instrument("inventory.ConcurrentInventory.delete_item")
+    def delete_item(self, name):
+        index = self.__shard_of(name)
+        shard = self.__shards[index]
+        with self.__locks[index]:
+            exists = shard._has_item(name)
+            if exists:
+                self.__release(shard._remove_item(name))
+        if exists:
+            logger.info("Item with name '%s' deleted successfully.", name)
+        else:
+            logger.info("Item with name '%s' does not exist", name)
+        return exists
+
+    @instrument("inventory.ConcurrentInventory.add_items")
+    def add_items(self, batch):
+        # same contract as Inventory.add_items: duplicates are skipped and the batch is rejected
+        # as a whole when it does not fit
+        by_shard = {}
+        count = 0
+        for item in batch:
+            by_shard.setdefault(self.__shard_of(item[0]), []).append(item)
+            count += 1
+        indices = sorted(by_shard)
+        for index in indices:
+            self.__locks[index].acquire()
+        try:
+            new_items = {}
+            for index in indices:
+                shard = self.__shards[index]
+                seen = set()
+                for name, price, quantity in by_shard[index]:
+                    if name not in seen and not shard._has_item(name):
+                        seen.add(name)
+                        new_items.setdefault(index, []).append((name, price, quantity))
+            added = sum(map(len, new_items.values()))
+            total = sum(quantity for items in new_items.values() for _, _, quantity in items)
+            fits = self.__reserve(total)
+            if fits:
+                for index, items in new_items.items():
+                    self.__shards[index]._insert_items(items)
+        finally:
+            for index in indices:
+                self.__locks[index].release()
+        if not fits:
+            logger.info("Max capacity reached. Batch of %s items rejected", added)
+            return 0
+        logger.info("%s items added to inventory, %s skipped as duplicates.", added, count - added)
+        return added
+
+    @instrument("inventory.ConcurrentInventory.delete_items")
+    def delete_items(self, names):
+        # deletes every existing name and logs a single summary; returns the number deleted
+        deleted = 0
+        missing = 0
+        for name in names:
+            index = self.__shard_of(name)
+            shard = self.__shards[index]
+            with self.__locks[index]:
+                exists = shard._has_item(name)
+                if exists:
+                    self.__release(shard._remove_item(name))
+            if exists:
+                deleted += 1
+            else:
+                missing += 1
+        logger.info("%s items deleted from inventory, %s not found.", deleted, missing)
+        return deleted
+
+    def find_items_in_price_range(self, min_price, max_price):
+        per_shard = []
+        for shard, lock in zip(self.__shards, self.__locks):
+            with lock:
+                names = shard.find_items_in_price_range(min_price, max_price)
+                per_shard.append([(shard.items[name]['price'], name) for name in names])
+        return [name for _, name in heapq.merge(*per_shard)]
+
+    def get_items_in_price_range(self, min_price, max_price):
+        results = self.find_items_in_price_range(min_price, max_price)
+        if logger.isEnabledFor(logging.INFO):
+            for item_name in results:
+                logger.info("Item with name '%s' is within price range", item_name)
+        return results
+
+    def get_most_stocked_item(self):
+        # decided on the quantity read under the shard lock: the item may be deleted right after
+        top = self.__most_stocked(1)
+        if not top or top[0][0] <= 0:
+            return None
+        return top[0][1]
+
+    def get_most_stocked_items(self, k):
+        return [name for _, name in self.__most_stocked(k)]
+
+    def get_least_stocked_items(self, k):
+        candidates = []
+        for shard, lock in zip(self.__shards, self.__locks):
+            with lock:
+                candidates.extend((shard.items[name]['quantity'], name) for name in shard.get_least_stocked_items(k))
+        return [name for _, name in heapq.nsmallest(k, candidates, key=_quantity_of)]
+
+    def get_quantity(self, name):
+        # quantity of an item, or None when it does not exist
+        index = self.__shard_of(name)
+        with self.__locks[index]:
+            item = self.__shards[index].items.get(name)
+            return item['quantity'] if item else None
+
+    def __len__(self):
+        return sum(len(shard.items) for shard in self.__shards)
+
+    def __most_stocked(self, k):
+        # (quantity, name) of the k most stocked items, each pair read under its shard lock
+        candidates = []
+        for shard, lock in zip(self.__shards, self.__locks):
+            with lock:
+                candidates.extend((shard.items[name]['quantity'], name) for name in shard.get_most_stocked_items(k))
+        return heapq.nlargest(k, candidates, key=_quantity_of)
+
+    def __shard_of(self, name):
+        return hash(name) % len(self.__shards)
+
+    def __reserve(self, quantity):
+        with self.__capacity_lock:
+            if self.__reserved + quantity > self.__max_capacity:
+                return False
+            self.__reserved += quantity
+            return True
+
+    def __release(self, quantity):
+        with self.__capacity_lock:
+            self.__reserved -= quantity
+
+
+class _SortedList:
+    # sorted sequence stored as a list of sorted blocks of at most 2 * _BLOCK_SIZE entries, with
+    # the last entry of every block in __maxes. An insert or delete bisects __maxes, then shifts
+    # entries inside one block only: O(log n + block size) instead of the O(n) memmove of one big
+    # sorted list, so building a large index item by item stays O(n log n).
+    # Entries are ordered by key(entry), or by themselves when key is None; keys must be unique.
+    # With a typecode the blocks are typed arrays, e.g. 'q' for row numbers.
+
+    def __init__(self, entries=(), key=None, typecode=None):
+        self.__key = key
+        self.__typecode = typecode
+        self.__blocks = []
+        self.__maxes = []
+        self.__len = 0
+        self.__load(sorted(entries, key=key))
+
+    def __len__(self):
+        return self.__len
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self.__blocks)
+
+    def __reversed__(self):
+        return itertools.chain.from_iterable(reversed(block) for block in reversed(self.__blocks))
+
+    def add(self, entry):
+        blocks, maxes, key = self.__blocks, self.__maxes, self.__key
+        if not blocks:
+            self.__load([entry])
+            return
+        i = bisect.bisect_right(maxes, entry if key is None else key(entry), key=key)
+        if i == len(blocks):
+            i -= 1
+            blocks[i].append(entry)
+            maxes[i] = entry
+        else:
+            bisect.insort(blocks[i], entry, key=key)
+        self.__len += 1
+        if len(blocks[i]) > 2 * _BLOCK_SIZE:
+            self.__split(i)
+
+    def remove(self, entry):
+        blocks, maxes, key = self.__blocks, self.__maxes, self.__key
+        value = entry if key is None else key(entry)
+        i = bisect.bisect_left(maxes, value, key=key)
+        block = blocks[i] if i < len(blocks) else ()
+        j = bisect.bisect_left(block, value, key=key)
+        if j == len(block) or block[j] != entry:
+            raise ValueError(f"{entry!r} not in index")
+        del block[j]
+        self.__len -= 1
+        if not block:
+            del blocks[i]
+            del maxes[i]
+            return
+        maxes[i] = block[-1]
+        if len(block) < _BLOCK_SIZE // 4 and len(blocks) > 1:
+            # fold a shrunken block into a neighbour so deletes do not leave many tiny blocks
+            if i == len(blocks) - 1:
+                i -= 1
+            blocks[i].extend(blocks.pop(i + 1))
+            maxes[i] = blocks[i][-1]
+            del maxes[i + 1]
+            if len(blocks[i]) > 2 * _BLOCK_SIZE:
+                self.__split(i)
+
+    def update(self, entries):
+        entries = sorted(entries, key=self.__key)
+        if len(entries) * _BLOCK_SIZE < self.__len:
+            for entry in entries:
+                self.add(entry)
+        elif entries:
+            # a big batch: timsort merges the two sorted runs in O(n + m)
+            self.__load(sorted(itertools.chain(self, entries), key=self.__key))
+
+    def difference_update(self, entries):
+        entries = list(entries)
+        if len(entries) * _BLOCK_SIZE < self.__len:
+            for entry in entries:
+                self.remove(entry)
+        elif entries:
+            removed = set(entries)
+            self.__load([entry for entry in self if entry not in removed])
+
+    def load_sorted(self, entries):
+        # replaces the contents with entries that are already in order
+        self.__load(entries)
+
+    def irange(self, low, high, key):
+        # entries with low <= key(entry) <= high, in order; O(log n + k)
+        blocks, maxes = self.__blocks, self.__maxes
+        first = bisect.bisect_left(maxes, low, key=key)
+        if first == len(blocks) or low > high:
+            return []
+        last = bisect.bisect_right(maxes, high, key=key)
+        start = bisect.bisect_left(blocks[first], low, key=key)
+        if last == len(blocks):
+            last -= 1
+            stop = len(blocks[last])
+        else:
+            stop = bisect.bisect_right(blocks[last], high, key=key)
+        # slicing keeps the block type, so the result is a list or a typed array
+        if first == last:
+            return blocks[first][start:stop]
+        result = blocks[first][start:]
+        for block in blocks[first + 1:last]:
+            result.extend(block)
+        result.extend(blocks[last][:stop])
+        return result
+
+    def __load(self, entries):
+        block_type = list if self.__typecode is None else functools.partial(array, self.__typecode)
+        self.__blocks = [block_type(entries[i:i + _BLOCK_SIZE]) for i in range(0, len(entries), _BLOCK_SIZE)]
+        self.__maxes = [block[-1] for block in self.__blocks]
+        self.__len = len(entries)
+
+    def __split(self, i):
+        block = self.__blocks[i]
+        half = len(block) // 2
+        self.__blocks.insert(i + 1, block[half:])
+        del block[half:]
+        self.__maxes[i] = block[-1]
+        self.__maxes.insert(i + 1, self.__blocks[i + 1][-1])
+
+
+class AsyncInventory:
+    # asyncio facade over ConcurrentInventory; every call runs in a worker thread, single-item calls
+    # included: a bulk call holds the shard locks of its whole batch, and waiting for one of them
+    # on the event loop would stall every other task
+
+    def __init__(self, inventory):
+        self.inventory = inventory
+
+    @property
+    def item_count(self):
+        return self.inventory.item_count
+
+    async def add_item(self, name, price, quantity):
+        return await asyncio.to_thread(self.inventory.add_item, name, price, quantity)
+
+    async def delete_item(self, name):
+        return await asyncio.to_thread(self.inventory.delete_item, name)
+
+    async def add_items(self, batch):
+        return await asyncio.to_thread(self.inventory.add_items, list(batch))
+
+    async def delete_items(self, names):
+        return await asyncio.to_thread(self.inventory.delete_items, list(names))
+
+    async def find_items_in_price_range(self, min_price, max_price):
+        return await asyncio.to_thread(self.inventory.find_items_in_price_range, min_price, max_price)
+
+    async def get_most_stocked_items(self, k):
+        return await asyncio.to_thread(self.inventory.get_most_stocked_items, k)
+
+    async def get_least_stocked_items(self, k):
+        return await asyncio.to_thread(self.inventory.get_least_stocked_items, k)
+
+
+def _quantity_of(entry):
+    return entry[0]
 
 
 if __name__ == '__main__':
@@ -0,0 +1,284 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+from array import array
+
+import numpy as np
+
+from inventory import CompactInventory
+from logger import logger
+
+# snapshot layout (native byte order so the columns can be mapped directly, 8-byte aligned sections):
+#   header: magic, item count, max capacity, journal generation, size of the names blob
+#   float64 prices[count]      - rows are written in insertion order, so reloading keeps tie-breaking
+#   int64 quantities[count]
+#   uint64 price_order[count]  - rows sorted by price, ties in insertion (row) order, for range
+#                                queries on the mapped file
+#   uint64 name_offsets[count + 1]
+#   utf-8 names blob
+SNAPSHOT_MAGIC = b"SMINV001"
+_HEADER = struct.Struct("=8sQqQQ")
+
+SNAPSHOT_FILE = "inventory.snapshot"
+JOURNAL_FILE = "journal.{generation}.log"
+
+
+def write_snapshot(inventory, path, max_capacity, generation=0):
+    # writes the whole inventory atomically: a crash leaves either the old or the new snapshot
+    if isinstance(inventory, CompactInventory):
+        names, prices, quantities, price_order = _compact_columns(inventory)
+    else:
+        items = inventory.items
+        names = list(items)
+        rows = {name: row for row, name in enumerate(names)}
+        price_order = array("Q", (rows[name] for name in
+                                  inventory.find_items_in_price_range(float("-inf"), float("inf"))))
+        prices = array("d", (items[name]['price'] for name in names))
+        quantities = array("q", (items[name]['quantity'] for name in names))
+    encoded = [name.encode("utf-8") for name in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(name) for name in encoded], out=offsets[1:])
+    blob = b"".join(encoded)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(_HEADER.pack(SNAPSHOT_MAGIC, len(names), max_capacity, generation, len(blob)))
+        file.write(memoryview(prices).cast("B"))
+        file.write(memoryview(quantities).cast("B"))
+        file.write(memoryview(price_order).cast("B"))
+        file.write(offsets.tobytes())
+        file.write(blob)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+def _compact_columns(inventory):
+    # the columns of a CompactInventory renumbered to rows in insertion order, without building
+    # per-item dicts or querying the price index
+    rows, prices, quantities, price_rows = inventory._columns()
+    names = list(rows)
+    row_numbers = np.fromiter(rows.values(), dtype=np.int64, count=len(names))
+    position = np.zeros(len(prices), dtype=np.uint64)
+    position[row_numbers] = np.arange(len(names), dtype=np.uint64)
+    price_order = position[np.fromiter(price_rows, dtype=np.int64, count=len(names))]
+    return (names, np.frombuffer(prices, dtype=np.float64)[row_numbers],
+            np.frombuffer(quantities, dtype=np.int64)[row_numbers], price_order)
+
+
+def _array(typecode, buffer):
+    # copies any buffer of 8-byte items into a typed array in one go
+    column = array(typecode)
+    column.frombytes(memoryview(buffer).cast("B"))
+    return column
+
+
+class InventorySnapshot:
+    # read-only, memory-mapped view of a snapshot; opening it only reads the header, the columns
+    # are paged in by the OS as queries touch them, and the name -> row dict is built on first use
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, self.max_capacity, self.generation, names_size = _HEADER.unpack_from(self.__map)
+        if magic != SNAPSHOT_MAGIC:
+            self.__map.close()
+            raise ValueError(f"'{path}' is not an inventory snapshot")
+        self.__view = view = memoryview(self.__map)
+        start = _HEADER.size
+        self.prices = view[start:start + 8 * count].cast("d")
+        start += 8 * count
+        self.quantities = view[start:start + 8 * count].cast("q")
+        start += 8 * count
+        self.__price_order = view[start:start + 8 * count].cast("Q")
+        start += 8 * count
+        self.__name_offsets = view[start:start + 8 * (count + 1)].cast("Q")
+        start += 8 * (count + 1)
+        self.__names = view[start:start + names_size]
+        self.__rows = None
+
+    def __len__(self):
+        return len(self.prices)
+
+    def __contains__(self, name):
+        return name in self.__row_index()
+
+    def name_at(self, row):
+        return bytes(self.__names[self.__name_offsets[row]:self.__name_offsets[row + 1]]).decode("utf-8")
+
+    def get_item(self, name):
+        row = self.__row_index()[name]
+        return {'name': name, 'price': self.prices[row], 'quantity': self.quantities[row]}
+
+    def find_items_in_price_range(self, min_price, max_price):
+        # names ordered by price, like Inventory.find_items_in_price_range
+        lo = bisect.bisect_left(self.__price_order, min_price, key=self.__price_of_row)
+        hi = bisect.bisect_right(self.__price_order, max_price, key=self.__price_of_row)
+        return [self.name_at(self.__price_order[position]) for position in range(lo, hi)]
+
+    def columns(self):
+        # copies of every column for CompactInventory._load_columns: names in row order, prices,
+        # quantities, rows in price order and rows in (quantity, -row) order
+        offsets = self.__name_offsets.tolist()
+        names_blob = bytes(self.__names)
+        names = [names_blob[start:stop].decode("utf-8") for start, stop in zip(offsets, offsets[1:])]
+        quantities = np.frombuffer(self.quantities, dtype=np.int64)
+        # rows are in insertion order, so the row number stands in for the insertion sequence
+        stock_order = np.lexsort((-np.arange(len(names)), quantities))
+        return (names, _array("d", self.prices), _array("q", self.quantities),
+                _array("q", self.__price_order), _array("q", stock_order))
+
+    def iter_items(self):
+        # yields (name, price, quantity) tuples in insertion order
+        for row in range(len(self)):
+            yield self.name_at(row), self.prices[row], self.quantities[row]
+
+    def close(self):
+        self.prices.release()
+        self.quantities.release()
+        self.__price_order.release()
+        self.__name_offsets.release()
+        self.__names.release()
+        self.__view.release()
+        self.__map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __price_of_row(self, row):
+        return self.prices[row]
+
+    def __row_index(self):
+        if self.__rows is None:
+            self.__rows = {self.name_at(row): row for row in range(len(self))}
+        return self.__rows
+
+
+class PersistentInventory(CompactInventory):
+    # CompactInventory whose state survives restarts: a snapshot plus an append-only journal of the
+    # successful add/delete calls made since. Reopening copies the snapshot columns straight into
+    # the arrays, builds both indices from the stored orders without sorting and replays only the
+    # journal tail; a torn last journal line from a crash is ignored. Reopening is still O(n):
+    # every name is decoded and the name -> row dict is built up front (about a second per million
+    # items), only the read-only InventorySnapshot maps the file lazily.
+    # Every `compact_every` journal records the state is written to a new snapshot generation and
+    # a fresh journal is started.
+
+    def __init__(self, directory, max_capacity=None, compact_every=100_000, fsync=False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.compact_every = compact_every
+        self.__fsync = fsync
+        self.__replaying = True
+        snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        snapshot = InventorySnapshot(snapshot_path) if os.path.exists(snapshot_path) else None
+        if max_capacity is None:
+            if snapshot is None:
+                raise ValueError("max_capacity is required to create a new inventory")
+            max_capacity = snapshot.max_capacity
+        self.__max_capacity = max_capacity
+        self.__generation = snapshot.generation if snapshot else 0
+        super().__init__(max_capacity)
+        if snapshot is not None:
+            with snapshot:
+                # the snapshot already holds both index orders, so nothing is re-sorted
+                self._load_columns(*snapshot.columns())
+        self.__journal_records = self.__replay_journal()
+        self.__remove_stale_journals()
+        self.__journal = open(self.__journal_path(), "a", encoding="utf-8")
+        self.__replaying = False
+
+    def add_item(self, name, price, quantity):
+        added = super().add_item(name, price, quantity)
+        if added:
+            self.__append(["add_item", name, price, quantity])
+        return added
+
+    def delete_item(self, name):
+        deleted = super().delete_item(name)
+        if deleted:
+            self.__append(["delete_item", name])
+        return deleted
+
+    def add_items(self, batch):
+        batch = [list(item) for item in batch]
+        added = super().add_items(batch)
+        if added:
+            self.__append(["add_items", batch])
+        return added
+
+    def delete_items(self, names):
+        names = list(names)
+        deleted = super().delete_items(names)
+        if deleted:
+            self.__append(["delete_items", names])
+        return deleted
+
+    def compact(self):
+        # writes a new snapshot generation and switches to an empty journal
+        generation = self.__generation + 1
+        write_snapshot(self, os.path.join(self.directory, SNAPSHOT_FILE), self.__max_capacity, generation)
+        old_journal = self.__journal
+        self.__generation = generation
+        self.__journal = open(self.__journal_path(), "a", encoding="utf-8")
+        self.__journal_records = 0
+        old_journal.close()
+        self.__remove_stale_journals()
+        logger.info("Inventory compacted into snapshot generation %s.", generation)
+
+    def close(self):
+        self.__journal.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __append(self, record):
+        if self.__replaying:
+            return
+        self.__journal.write(json.dumps(record) + "\n")
+        self.__journal.flush()
+        if self.__fsync:
+            os.fsync(self.__journal.fileno())
+        self.__journal_records += 1
+        if self.__journal_records >= self.compact_every:
+            self.compact()
+
+    def __replay_journal(self):
+        path = self.__journal_path()
+        if not os.path.exists(path):
+            return 0
+        replayed = 0
+        valid_size = 0
+        with open(path, "rb") as file:
+            for line in file:
+                try:
+                    method, *args = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                getattr(self, method)(*args)
+                replayed += 1
+                valid_size += len(line)
+        # cut a torn tail so that new records start on a clean line
+        if valid_size != os.path.getsize(path):
+            with open(path, "r+b") as file:
+                file.truncate(valid_size)
+        return replayed
+
+    def __remove_stale_journals(self):
+        current = os.path.basename(self.__journal_path())
+        for file_name in os.listdir(self.directory):
+            if file_name.startswith("journal.") and file_name.endswith(".log") and file_name != current:
+                os.remove(os.path.join(self.directory, file_name))
+
+    def __journal_path(self):
+        return os.path.join(self.directory, JOURNAL_FILE.format(generation=self.__generation))
@@ -1,29 +1,265 @@
 # logger.py
+import atexit
+import copy
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+import warnings
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
 
-LOG_DIR = "/Users/krzysztofbienias/Documents/logs"
-os.makedirs(LOG_DIR, exist_ok=True)
-
+# configuration is read from the environment at import time, but nothing touches the file system
+# until the first record is emitted or configure() is called
+LOG_DIR = os.environ.get("SMALL_MASTERPIECES_LOG_DIR",
+                         os.path.join(os.path.expanduser("~"), "Documents", "logs"))
 LOG_FILE = os.path.join(LOG_DIR, "small_masterpieces.log")
+LOG_LEVEL = os.environ.get("SMALL_MASTERPIECES_LOG_LEVEL", "DEBUG").upper()
+if LOG_LEVEL not in logging.getLevelNamesMapping():
+    # an unknown level must not make every importing module fail
+    warnings.warn(f"Unknown SMALL_MASTERPIECES_LOG_LEVEL '{LOG_LEVEL}', using DEBUG", RuntimeWarning)
+    LOG_LEVEL = "DEBUG"
+# comma separated subset of "file" and "console"; an empty value discards every record
+LOG_SINKS = os.environ.get("SMALL_MASTERPIECES_LOG_SINKS", "file,console")
+LOG_ASYNC = os.environ.get("SMALL_MASTERPIECES_LOG_ASYNC", "0").lower() in ("1", "true", "yes")
+
+# what BoundedQueueHandler does with a record when the queue is full
+OVERFLOW_POLICIES = ("block", "drop_new", "drop_oldest")
+# record arguments of these exact types cannot change after the call, so formatting them can wait
+_IMMUTABLE_ARG_TYPES = frozenset({str, int, float, bool, complex, bytes, type(None)})
+
+
+class BatchingRotatingFileHandler(RotatingFileHandler):
+    """Rotating file handler that flushes the stream once per `batch_size` records instead of after each one."""
+
+    def __init__(self, *args, batch_size=1, **kwargs):
+        self.batch_size = batch_size
+        self.__pending = 0
+        self.__emitting = False
+        super().__init__(*args, **kwargs)
+
+    def emit(self, record):
+        self.__emitting = True
+        try:
+            super().emit(record)
+        finally:
+            self.__emitting = False
+
+    def flush(self):
+        # StreamHandler.emit calls flush after every record; only let every batch_size-th one through
+        if self.__emitting:
+            self.__pending += 1
+            if self.__pending < self.batch_size:
+                return
+        self.__pending = 0
+        super().flush()
+
+
+class BoundedQueueHandler(QueueHandler):
+    """Queue handler for a bounded queue with an explicit policy for a full queue."""
+
+    def __init__(self, log_queue, overflow="drop_new"):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}, got '{overflow}'")
+        super().__init__(log_queue)
+        self.overflow = overflow
+        self.dropped_records = 0
+
+    def prepare(self, record):
+        # the listener runs in this process, so formatting can usually wait for the listener thread;
+        # mutable arguments are formatted now so the record shows their state at the call, and
+        # tracebacks are rendered now so their frames are not kept alive in the queue
+        if not record.exc_info and _immutable(record.args):
+            return record
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self.overflow == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if self.overflow == "drop_oldest":
+            try:
+                self.queue.get_nowait()
+                self.queue.put_nowait(record)
+            except (queue.Empty, queue.Full):
+                pass
+        self.dropped_records += 1
+
+
+def _immutable(args):
+    return not args or (isinstance(args, tuple) and all(type(arg) in _IMMUTABLE_ARG_TYPES for arg in args))
+
+
+class _BatchingQueueListener(QueueListener):
+    """Queue listener that flushes its handlers whenever it has drained the queue."""
+
+    def dequeue(self, block):
+        if block and self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+        return self.queue.get(block)
+
+    def enqueue_sentinel(self):
+        # block instead of failing when the bounded queue is full at shutdown
+        self.queue.put(self._sentinel)
+
+
+class _LazyConfigHandler(logging.Handler):
+    """Placeholder handler that runs configure() on the first record reaching it, then hands the record over."""
+
+    def handle(self, record):
+        try:
+            configure()
+        except Exception:
+            # a broken log setup must not fail the caller, whose work is already done: report it
+            # once on stderr and keep logging there
+            self.handleError(record)
+            _configure_fallback()
+        for handler in logger.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+        return True
+
+    def emit(self, record):
+        pass
+
 
 # Formatter
 formatter = logging.Formatter("[%(asctime)s] %(levelname)s in %(name)s: %(message)s")
 
-# File Handler with rotation
-file_handler = RotatingFileHandler(LOG_FILE, maxBytes=1_000_000, backupCount=5)
-file_handler.setFormatter(formatter)
-file_handler.setLevel(logging.DEBUG)
-
-# Console Handler (optional)
-console_handler = logging.StreamHandler()
-console_handler.setFormatter(formatter)
-console_handler.setLevel(logging.INFO)
+# created by configure()
+file_handler = None
+console_handler = None
 
-# Logger setup
+# Logger setup: only the level is applied eagerly, so disabled records are rejected by the
+# logger's level check before any message formatting or handler setup happens
 logger = logging.getLogger("small_masterpieces_logger")
-logger.setLevel(logging.DEBUG)
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
-logger.propagate = False
\ No newline at end of file
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+_lazy_handler = _LazyConfigHandler()
+logger.addHandler(_lazy_handler)
+_configure_lock = threading.Lock()
+_configured = False
+
+_queue_handler = None
+_listener = None
+
+
+def configure(log_dir=None, level=None, sinks=None, async_mode=None):
+    """
+    Sets up the handlers of `logger`; runs automatically on the first emitted record.
+
+    Arguments left as None fall back to the SMALL_MASTERPIECES_LOG_DIR, SMALL_MASTERPIECES_LOG_LEVEL,
+    SMALL_MASTERPIECES_LOG_SINKS and SMALL_MASTERPIECES_LOG_ASYNC environment variables. `sinks` is an
+    iterable (or comma separated string) of "file" and "console". Only the first call has an effect.
+    """
+    global _configured, file_handler, console_handler, LOG_DIR, LOG_FILE
+    with _configure_lock:
+        if _configured:
+            return
+        if level is not None:
+            logger.setLevel(level)
+        if sinks is None:
+            sinks = LOG_SINKS
+        if isinstance(sinks, str):
+            sinks = sinks.split(",")
+        sinks = {sink.strip().lower() for sink in sinks if sink.strip()}
+        unknown = sinks - {"file", "console"}
+        if unknown:
+            raise ValueError(f"unknown log sinks: {sorted(unknown)}")
+
+        handlers = []
+        if "file" in sinks:
+            if log_dir is not None:
+                LOG_DIR = log_dir
+                LOG_FILE = os.path.join(LOG_DIR, "small_masterpieces.log")
+            os.makedirs(LOG_DIR, exist_ok=True)
+            # File Handler with rotation
+            file_handler = BatchingRotatingFileHandler(LOG_FILE, maxBytes=1_000_000, backupCount=5)
+            file_handler.setFormatter(formatter)
+            file_handler.setLevel(logging.DEBUG)
+            handlers.append(file_handler)
+        if "console" in sinks:
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(formatter)
+            console_handler.setLevel(logging.INFO)
+            handlers.append(console_handler)
+        if not handlers:
+            handlers.append(logging.NullHandler())
+        # a new list rather than in-place edits: the record that triggered us is still being
+        # dispatched over the old one, which must not grow the real handlers
+        logger.handlers = [handler for handler in logger.handlers if handler is not _lazy_handler] + handlers
+        _configured = True
+    if LOG_ASYNC if async_mode is None else async_mode:
+        enable_async_logging()
+
+
+def _configure_fallback():
+    """Replaces the lazy handler with a stderr handler for warnings and errors, after configure() failed."""
+    global _configured, console_handler
+    with _configure_lock:
+        if _configured:
+            return
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(formatter)
+        console_handler.setLevel(logging.WARNING)
+        logger.handlers = [handler for handler in logger.handlers if handler is not _lazy_handler] + [console_handler]
+        _configured = True
+
+
+def enable_async_logging(queue_size=10_000, overflow="drop_new", batch_size=64):
+    """
+    Moves formatting and I/O of `logger` records to a background thread.
+
+    Records go through a bounded queue to a listener that owns the file and console handlers, so
+    the calling thread never waits for disk writes or rollover. The file is flushed every
+    `batch_size` records and whenever the queue runs empty. `overflow` decides what happens when
+    the queue is full: "block" waits for space, "drop_new" discards the new record and
+    "drop_oldest" discards the oldest queued one; drops are counted in `dropped_records` of the
+    returned handler. Pending records are written on disable_async_logging() or interpreter exit.
+    """
+    global _queue_handler, _listener
+    configure()
+    if _listener is not None:
+        return _queue_handler
+    log_queue = queue.Queue(maxsize=queue_size)
+    _queue_handler = BoundedQueueHandler(log_queue, overflow)
+    handlers = list(logger.handlers)
+    for handler in handlers:
+        logger.removeHandler(handler)
+    if file_handler is not None:
+        file_handler.batch_size = batch_size
+    _listener = _BatchingQueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    logger.addHandler(_queue_handler)
+    return _queue_handler
+
+
+def disable_async_logging():
+    """Drains the queue, flushes the handlers and attaches them to `logger` directly again."""
+    global _queue_handler, _listener
+    if _listener is None:
+        return
+    logger.removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.flush()
+        logger.addHandler(handler)
+    if file_handler is not None:
+        file_handler.batch_size = 1
+    _queue_handler = None
+    _listener = None
+
+
+atexit.register(disable_async_logging)
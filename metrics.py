@@ -0,0 +1,161 @@
+# metrics.py
+import atexit
+import bisect
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+# everything here is opt-in through the environment and decided at import time: with metrics
+# disabled, instrument() hands back the undecorated function, so production code pays nothing
+METRICS_ENABLED = os.environ.get("SMALL_MASTERPIECES_METRICS", "0").lower() in ("1", "true", "yes")
+# file receiving cProfile stats (pstats format) at interpreter exit
+PROFILE_PATH = os.environ.get("SMALL_MASTERPIECES_PROFILE")
+TRACEMALLOC_ENABLED = os.environ.get("SMALL_MASTERPIECES_TRACEMALLOC", "0").lower() in ("1", "true", "yes")
+
+# upper bounds (seconds) of the latency histogram buckets, the last bucket is unbounded
+LATENCY_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+                   1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_counters = {}
+_latencies = {}
+_profiler = None
+
+
+class LatencyHistogram:
+    """Latency histogram with the fixed LATENCY_BUCKETS bounds."""
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "buckets": {str(bound): count for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), self.bucket_counts)},
+        }
+
+
+def instrument(name):
+    """
+    Decorator counting calls of a function and recording their latency under `name`.
+
+    Returns the function unchanged when metrics are disabled.
+    """
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def observe(name, seconds):
+    """Records one call of `name` that took `seconds`."""
+    with _lock:
+        histogram = _latencies.get(name)
+        if histogram is None:
+            histogram = _latencies[name] = LatencyHistogram()
+        histogram.observe(seconds)
+
+
+def increment(name, value=1):
+    """Adds `value` to the counter `name`; a no-op when metrics are disabled."""
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def reset():
+    """Drops every recorded counter and histogram."""
+    with _lock:
+        _counters.clear()
+        _latencies.clear()
+
+
+def snapshot(top_allocations=10):
+    """
+    Returns the current metrics as a JSON-serialisable dict.
+
+    With tracemalloc capture on, the dict also holds current/peak traced memory and the source
+    lines with the largest allocations.
+    """
+    with _lock:
+        result = {
+            "timestamp": time.time(),
+            "counters": dict(_counters),
+            "latencies": {name: histogram.to_dict() for name, histogram in _latencies.items()},
+        }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        statistics = tracemalloc.take_snapshot().statistics("lineno")[:top_allocations]
+        result["memory"] = {
+            "current_bytes": current,
+            "peak_bytes": peak,
+            "top_allocations": [{"location": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+                                for stat in statistics],
+        }
+    return result
+
+
+def to_json(indent=None):
+    """Returns snapshot() serialised as JSON."""
+    return json.dumps(snapshot(), indent=indent)
+
+
+def to_prometheus():
+    """Returns the metrics in the Prometheus text exposition format."""
+    data = snapshot(top_allocations=0)
+    lines = []
+    if data["counters"]:
+        lines.append("# TYPE small_masterpieces_events_total counter")
+        for name, value in sorted(data["counters"].items()):
+            lines.append(f'small_masterpieces_events_total{{event="{name}"}} {value}')
+    if data["latencies"]:
+        lines.append("# TYPE small_masterpieces_call_duration_seconds histogram")
+        for name, histogram in sorted(data["latencies"].items()):
+            cumulative = 0
+            for bound, count in histogram["buckets"].items():
+                cumulative += count
+                lines.append(f'small_masterpieces_call_duration_seconds_bucket{{operation="{name}",le="{bound}"}} '
+                             f'{cumulative}')
+            lines.append(f'small_masterpieces_call_duration_seconds_sum{{operation="{name}"}} {histogram["sum"]}')
+            lines.append(f'small_masterpieces_call_duration_seconds_count{{operation="{name}"}} {histogram["count"]}')
+    if "memory" in data:
+        lines.append("# TYPE small_masterpieces_traced_memory_bytes gauge")
+        lines.append(f'small_masterpieces_traced_memory_bytes{{kind="current"}} {data["memory"]["current_bytes"]}')
+        lines.append(f'small_masterpieces_traced_memory_bytes{{kind="peak"}} {data["memory"]["peak_bytes"]}')
+    return "\n".join(lines) + "\n"
+
+
+def _dump_profile():
+    _profiler.disable()
+    _profiler.dump_stats(PROFILE_PATH)
+
+
+if PROFILE_PATH:
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+    atexit.register(_dump_profile)
+
+if TRACEMALLOC_ENABLED and not tracemalloc.is_tracing():
+    tracemalloc.start()
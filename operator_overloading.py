@@ -1,17 +1,82 @@
 import math
+import numbers
+
+import numpy as np
+
+
+# crafting recipes: (ingredient, ingredient) -> result, ingredients in sorted order
+RECIPES = {
+    ('bronze', 'bronze'): 'iron',
+    ('iron', 'iron'): 'steel',
+}
+
+
+class CraftingError(Exception):
+    # raised when two swords do not make up any recipe
+    pass
+
 
-import math
 class Sword:
     def __init__(self, sword_type):
         self.sword_type = sword_type
 
     def __add__(self, other):
-        if self.sword_type == 'bronze' and other.sword_type == 'bronze':
-            return Sword('iron')
-        if self.sword_type == 'iron' and other.sword_type == 'iron':
-            return Sword("steel")
+        result = RECIPES.get(_recipe_key(self.sword_type, other.sword_type))
+        if result is None:
+            raise CraftingError(f"cannot craft {self.sword_type} + {other.sword_type}")
+        return Sword(result)
+
+
+def craft_swords(counts, recipes=None):
+    # crafts as much as possible from a stockpile given as {sword_type: count}, without creating a
+    # Sword per item. Recipes run in topological order (a recipe only after every recipe producing
+    # its ingredients), each one applied as many times as its ingredients allow, so whole chains
+    # resolve in O(types). Returns ({result_type: number crafted}, {sword_type: count left over}).
+    recipes = RECIPES if recipes is None else recipes
+    leftovers = dict(counts)
+    for sword_type, count in leftovers.items():
+        if count < 0:
+            raise ValueError(f"Count of '{sword_type}' swords must be non-negative, got {count}")
+    crafted = {}
+    for (first, second), result in _crafting_order(recipes):
+        if first == second:
+            n = leftovers.get(first, 0) // 2
         else:
-            raise Exception("cannot craft")
+            n = min(leftovers.get(first, 0), leftovers.get(second, 0))
+        if n == 0:
+            continue
+        leftovers[first] -= n
+        leftovers[second] -= n
+        leftovers[result] = leftovers.get(result, 0) + n
+        crafted[result] = crafted.get(result, 0) + n
+    return crafted, {sword_type: count for sword_type, count in leftovers.items() if count}
+
+
+def _recipe_key(first, second):
+    return (first, second) if first <= second else (second, first)
+
+
+def _crafting_order(recipes):
+    # recipes sorted so that the producers of a sword type come before its consumers (Kahn's algorithm)
+    consumers = {}
+    pending = {}
+    for ingredients, result in recipes.items():
+        for sword_type in set(ingredients):
+            consumers.setdefault(sword_type, []).append(result)
+            pending.setdefault(sword_type, 0)
+        pending[result] = pending.get(result, 0) + len(set(ingredients))
+    rank = {}
+    ready = [sword_type for sword_type, count in pending.items() if count == 0]
+    while ready:
+        sword_type = ready.pop()
+        rank[sword_type] = len(rank)
+        for result in consumers.get(sword_type, ()):
+            pending[result] -= 1
+            if pending[result] == 0:
+                ready.append(result)
+    if len(rank) != len(pending):
+        raise ValueError("Crafting recipes must not form a cycle")
+    return sorted(recipes.items(), key=lambda recipe: max(rank[sword_type] for sword_type in recipe[0]))
 
 
 class Complex(object):
@@ -20,16 +85,28 @@ class Complex(object):
         self.imaginary = imaginary
 
     def __add__(self, no):
+        if isinstance(no, ComplexArray):
+            # let ComplexArray apply the operation elementwise
+            return NotImplemented
         return Complex(self.real + no.real, self.imaginary + no.imaginary)
 
     def __sub__(self, no):
+        if isinstance(no, ComplexArray):
+            # let ComplexArray apply the operation elementwise
+            return NotImplemented
         return Complex(self.real - no.real, self.imaginary - no.imaginary)
 
     def __mul__(self, no):
+        if isinstance(no, ComplexArray):
+            # let ComplexArray apply the operation elementwise
+            return NotImplemented
         return Complex(self.real * no.real - self.imaginary * no.imaginary,
                        self.real * no.imaginary + self.imaginary * no.real)
 
     def __truediv__(self, no):
+        if isinstance(no, ComplexArray):
+            # let ComplexArray apply the operation elementwise
+            return NotImplemented
         den = no.real ** 2 + no.imaginary ** 2
 
         return Complex((self.real * no.real + no.imaginary * self.imaginary) / den,
@@ -53,3 +130,122 @@ class Complex(object):
         else:
             result = "%.2f-%.2fi" % (self.real, abs(self.imaginary))
         return result
+
+
+class ComplexArray(object):
+    # many complex numbers stored as two contiguous float64 arrays; supports the Complex operator
+    # surface elementwise, with broadcasting against other ComplexArrays, Complex values and scalars
+
+    def __init__(self, real, imaginary):
+        self.real, self.imaginary = np.broadcast_arrays(np.asarray(real, dtype=np.float64),
+                                                        np.asarray(imaginary, dtype=np.float64))
+
+    @classmethod
+    def from_complex(cls, values):
+        values = list(values)
+        return cls([value.real for value in values], [value.imaginary for value in values])
+
+    def __len__(self):
+        return len(self.real)
+
+    def __getitem__(self, index):
+        if np.ndim(self.real[index]) == 0:
+            return Complex(float(self.real[index]), float(self.imaginary[index]))
+        return ComplexArray(self.real[index], self.imaginary[index])
+
+    # NumPy defers to the reflected operators below instead of treating the array as an object
+    __array_ufunc__ = None
+
+    def __add__(self, no):
+        parts = _parts(no)
+        if parts is None:
+            return NotImplemented
+        return ComplexArray(self.real + parts[0], self.imaginary + parts[1])
+
+    def __radd__(self, no):
+        return self.__add__(no)
+
+    def __sub__(self, no):
+        parts = _parts(no)
+        if parts is None:
+            return NotImplemented
+        return ComplexArray(self.real - parts[0], self.imaginary - parts[1])
+
+    def __rsub__(self, no):
+        parts = _parts(no)
+        if parts is None:
+            return NotImplemented
+        return ComplexArray(parts[0] - self.real, parts[1] - self.imaginary)
+
+    def __mul__(self, no):
+        parts = _parts(no)
+        if parts is None:
+            return NotImplemented
+        real, imaginary = parts
+        return ComplexArray(self.real * real - self.imaginary * imaginary,
+                            self.real * imaginary + self.imaginary * real)
+
+    def __rmul__(self, no):
+        return self.__mul__(no)
+
+    def __truediv__(self, no):
+        # elements divided by zero become nan instead of raising, see divide() for the mask
+        parts = _parts(no)
+        if parts is None:
+            return NotImplemented
+        return _divide(self.real, self.imaginary, *parts)[0]
+
+    def __rtruediv__(self, no):
+        parts = _parts(no)
+        if parts is None:
+            return NotImplemented
+        return _divide(*parts, self.real, self.imaginary)[0]
+
+    def divide(self, no):
+        # returns the quotient and a boolean mask of the elements whose denominator was zero
+        parts = _parts(no)
+        if parts is None:
+            raise TypeError(f"cannot divide ComplexArray by {type(no).__name__}")
+        return _divide(self.real, self.imaginary, *parts)
+
+    def abs(self):
+        # magnitudes as a plain float array, without building a complex result
+        return np.hypot(self.real, self.imaginary)
+
+    def mod(self):
+        return ComplexArray(self.abs(), 0.0)
+
+    def format(self):
+        # every value formatted like Complex.__str__, as a NumPy string array
+        real_text = np.char.mod("%.2f", self.real)
+        # Complex.__str__ prints a zero real part as 0.00 (never -0.00) unless the imaginary part is zero too
+        real_text = np.where((self.real == 0) & (self.imaginary != 0), "0.00", real_text)
+        # like Complex.__str__, only positive and zero imaginary parts get "+": NaN gets "-"
+        sign = np.where((self.imaginary > 0) | (self.imaginary == 0), "+", "-")
+        imaginary_text = np.char.mod("%.2f", np.abs(self.imaginary))
+        return np.char.add(np.char.add(np.char.add(real_text, sign), imaginary_text), "i")
+
+    def __str__(self):
+        return "[" + ", ".join(self.format().tolist()) + "]"
+
+
+def _parts(no):
+    # real and imaginary parts of any operand supported by ComplexArray, None for anything else
+    if isinstance(no, (ComplexArray, Complex)):
+        return no.real, no.imaginary
+    if isinstance(no, (numbers.Complex, np.ndarray)):
+        if np.iscomplexobj(no):
+            return np.real(no), np.imag(no)
+        return no, 0.0
+    return None
+
+
+def _divide(real, imaginary, den_real, den_imaginary):
+    # elementwise (real + imaginary i) / (den_real + den_imaginary i) with nan where the
+    # denominator is zero; returns the quotient and the boolean mask of those elements
+    den = den_real ** 2 + den_imaginary ** 2
+    zero = den == 0
+    safe_den = np.where(zero, 1.0, den)
+    quotient = ComplexArray(np.where(zero, np.nan, (real * den_real + den_imaginary * imaginary) / safe_den),
+                            np.where(zero, np.nan, (den_real * imaginary - den_imaginary * real) / safe_den))
+    return quotient, np.broadcast_to(zero, quotient.real.shape)
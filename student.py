@@ -1,14 +1,32 @@
+import bisect
+import csv
+import itertools
+import math
+
+import numpy as np
+
+
 class Student:
     all_students = []
 
-    # Write your code here.
+    # running aggregates over all_students, kept up to date by __init__ and the grade setter
+    _grade_sum = 0
+    _next_sequence = 0
+    # grade -> students with that grade in creation order, and the distinct grades sorted; grades
+    # are bounded to [0-100], so there are few buckets and registering a student is an append
+    _grade_buckets = {}
+    _grades = []
 
     def __init__(self, name, grade):
+        Student._check_grade(grade)
         self.name = name
         self._grade = grade
-        # Write your code here.
-
-    # Write your code here.
+        self._sequence = Student._next_sequence
+        Student._next_sequence += 1
+        Student.all_students.append(self)
+        Student._grade_sum += grade
+        # the newest student always goes last in its bucket
+        Student._bucket(grade).append(self)
 
     @property
     def grade(self):
@@ -16,10 +34,29 @@ class Student:
 
     @grade.setter
     def grade(self, new_grade):
-        if new_grade < 0 or new_grade > 100:
-            ValueError("New grade not in accepted range of [0-100]")
+        Student._check_grade(new_grade)
+        bucket = Student._grade_buckets[self._grade]
+        del bucket[bisect.bisect_left(bucket, self._sequence, key=_sequence_of)]
+        if not bucket:
+            del Student._grade_buckets[self._grade]
+            del Student._grades[bisect.bisect_left(Student._grades, self._grade)]
+        bisect.insort(Student._bucket(new_grade), self, key=_sequence_of)
+        Student._grade_sum += new_grade - self._grade
         self._grade = new_grade
 
+    @staticmethod
+    def _check_grade(grade):
+        if grade < 0 or grade > 100:
+            raise ValueError("New grade not in accepted range of [0-100]")
+
+    @staticmethod
+    def _bucket(grade):
+        bucket = Student._grade_buckets.get(grade)
+        if bucket is None:
+            bucket = Student._grade_buckets[grade] = []
+            bisect.insort(Student._grades, grade)
+        return bucket
+
     @staticmethod
     def calculate_average_student(students):
         res = 0
@@ -29,9 +66,135 @@ class Student:
             res += student.grade
         return res / len(students)
 
+    @classmethod
+    def get_average_grade(cls):
+        # average over all students in O(1), -1 when there are none, like calculate_average_student
+        if not cls.all_students:
+            return -1
+        return cls._grade_sum / len(cls.all_students)
+
+    @classmethod
     def get_best_student(cls):
-        best_student = None
-        for student in cls.all_students:
-            if best_student == None and best_student.grade < student.grade:
-                best_student = student
-        return best_student
\ No newline at end of file
+        # the student with the highest grade, the earliest created one on ties
+        if not cls._grades:
+            return None
+        return cls._grade_buckets[cls._grades[-1]][0]
+
+    @classmethod
+    def get_top_students(cls, k):
+        # the k best students, best first
+        top = []
+        for grade in reversed(cls._grades):
+            if len(top) >= k:
+                break
+            top.extend(cls._grade_buckets[grade][:k - len(top)])
+        return top
+
+    @classmethod
+    def get_grade_percentile(cls, percentile):
+        # nearest-rank percentile of all grades, -1 when there are no students; walks the
+        # distinct grades, at most 101 of them for integer grades
+        if percentile < 0 or percentile > 100:
+            raise ValueError("Percentile not in accepted range of [0-100]")
+        count = len(cls.all_students)
+        if not count:
+            return -1
+        rank = max(1, math.ceil(percentile / 100 * count))
+        for grade in cls._grades:
+            rank -= len(cls._grade_buckets[grade])
+            if rank <= 0:
+                return grade
+
+
+def _sequence_of(student):
+    return student._sequence
+
+
+class GradeStatistics:
+    # cohort statistics accumulated chunk by chunk from grade arrays, without creating Student
+    # objects; memory stays at one histogram bin per grade step plus one entry per group. The
+    # histogram has one bin per GRADE_DECIMALS decimal place value: percentiles are exact, and
+    # match the Student class methods, for grades with at most that many decimals; other grades
+    # are rounded to the nearest bin for the histogram only. The mean and the group aggregates
+    # always use the exact grades.
+    GRADE_DECIMALS = 2
+    _STEPS = 10 ** GRADE_DECIMALS
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.histogram = np.zeros(100 * self._STEPS + 1, dtype=np.int64)
+        # group name -> [count, sum, min, max]
+        self.groups = {}
+
+    def update(self, grades, groups=None):
+        grades = np.asarray(grades, dtype=np.float64)
+        invalid = np.isnan(grades) | (grades < 0) | (grades > 100)
+        if invalid.any():
+            raise ValueError(f"Grade {grades[invalid][0]} not in accepted range of [0-100]")
+        self.count += len(grades)
+        self.total += float(grades.sum())
+        bins = np.rint(grades * self._STEPS).astype(np.int64)
+        self.histogram += np.bincount(bins, minlength=len(self.histogram))
+        if groups is not None:
+            self.__update_groups(grades, np.asarray(groups))
+
+    def mean(self):
+        # -1 when there are no grades, like Student.calculate_average_student
+        if not self.count:
+            return -1
+        return self.total / self.count
+
+    def percentile(self, percentile):
+        # nearest-rank percentile read from the histogram, -1 when there are no grades; the bin
+        # index divided by _STEPS is the closest float to the grade, as parsed from its decimal form
+        if percentile < 0 or percentile > 100:
+            raise ValueError("Percentile not in accepted range of [0-100]")
+        if not self.count:
+            return -1
+        rank = max(1, math.ceil(percentile / 100 * self.count))
+        return int(np.searchsorted(np.cumsum(self.histogram), rank)) / self._STEPS
+
+    def group_aggregates(self):
+        # group name -> {'count', 'mean', 'min', 'max'}
+        return {name: {'count': count, 'mean': total / count, 'min': low, 'max': high}
+                for name, (count, total, low, high) in self.groups.items()}
+
+    def __update_groups(self, grades, groups):
+        names, codes = np.unique(groups, return_inverse=True)
+        counts = np.bincount(codes, minlength=len(names))
+        totals = np.bincount(codes, weights=grades, minlength=len(names))
+        lows = np.full(len(names), np.inf)
+        highs = np.full(len(names), -np.inf)
+        np.minimum.at(lows, codes, grades)
+        np.maximum.at(highs, codes, grades)
+        for name, count, total, low, high in zip(names.tolist(), counts.tolist(), totals.tolist(),
+                                                 lows.tolist(), highs.tolist()):
+            aggregate = self.groups.get(name)
+            if aggregate is None:
+                self.groups[name] = [count, total, low, high]
+            else:
+                aggregate[0] += count
+                aggregate[1] += total
+                aggregate[2] = min(aggregate[2], low)
+                aggregate[3] = max(aggregate[3], high)
+
+
+def load_grade_statistics(path, grade_column="grade", group_column=None, chunk_size=100_000):
+    # streams a CSV file with a header row into GradeStatistics, chunk_size rows at a time
+    statistics = GradeStatistics()
+    with open(path, newline="") as file:
+        reader = csv.reader(file)
+        header = next(reader, None)
+        if header is None:
+            return statistics
+        grade_index = header.index(grade_column)
+        group_index = header.index(group_column) if group_column is not None else None
+        while True:
+            rows = list(itertools.islice(reader, chunk_size))
+            if not rows:
+                break
+            grades = np.array([row[grade_index] for row in rows], dtype=np.float64)
+            groups = [row[group_index] for row in rows] if group_index is not None else None
+            statistics.update(grades, groups)
+    return statistics
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import random
+import threading
+
+from inventory import AsyncInventory, ConcurrentInventory
+from logger import logger
+
+THREADS = 8
+OPERATIONS = 5_000
+
+
+def _run_threads(targets):
+    # runs every target(seed) in its own thread and re-raises the first failure here
+    errors = []
+
+    def guarded(target, seed):
+        try:
+            target(seed)
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=guarded, args=(target, seed)) for seed, target in enumerate(targets)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def _assert_consistent(inventory, max_capacity):
+    quantities = [inventory.get_quantity(f"item-{i}") for i in range(200)]
+    assert inventory.item_count == sum(quantity for quantity in quantities if quantity is not None)
+    assert 0 <= inventory.item_count <= max_capacity
+
+
+def setup_module():
+    logger.setLevel(logging.CRITICAL)
+
+
+def test_item_count_stays_consistent_under_parallel_add_and_delete():
+    max_capacity = 500
+    inventory = ConcurrentInventory(max_capacity, shards=4)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(OPERATIONS):
+            name = f"item-{rng.randrange(200)}"
+            if rng.random() < 0.5:
+                inventory.add_item(name, rng.uniform(1, 100), rng.randint(1, 20))
+            else:
+                inventory.delete_item(name)
+
+    _run_threads([worker] * THREADS)
+    _assert_consistent(inventory, max_capacity)
+
+
+def test_batches_keep_item_count_consistent():
+    max_capacity = 2_000
+    inventory = ConcurrentInventory(max_capacity, shards=4)
+
+    def worker(seed):
+        rng = random.Random(seed)
+        for _ in range(OPERATIONS // 10):
+            names = [f"item-{rng.randrange(200)}" for _ in range(10)]
+            if rng.random() < 0.5:
+                inventory.add_items([(name, rng.uniform(1, 100), rng.randint(1, 20)) for name in names])
+            else:
+                inventory.delete_items(names)
+
+    _run_threads([worker] * THREADS)
+    _assert_consistent(inventory, max_capacity)
+
+
+def test_stock_queries_during_deletes_do_not_fail():
+    inventory = ConcurrentInventory(10 ** 9, shards=4)
+
+    def writer(seed):
+        rng = random.Random(seed)
+        for _ in range(OPERATIONS):
+            name = f"item-{rng.randrange(20)}"
+            if rng.random() < 0.5:
+                inventory.add_item(name, 1.0, rng.randint(1, 5))
+            else:
+                inventory.delete_item(name)
+
+    def reader(_):
+        for _ in range(OPERATIONS):
+            top = inventory.get_most_stocked_item()
+            assert top is None or top.startswith("item-")
+
+    _run_threads([writer] * (THREADS - 2) + [reader] * 2)
+    _assert_consistent(inventory, 10 ** 9)
+
+
+def test_async_single_item_calls_run_alongside_a_bulk_add():
+    inventory = AsyncInventory(ConcurrentInventory(10 ** 9, shards=4))
+    batch = [(f"bulk-{i}", 1.0, 1) for i in range(20_000)]
+
+    async def singles():
+        added = [await inventory.add_item(f"item-{i}", 2.0, 2) for i in range(100)]
+        deleted = [await inventory.delete_item(f"item-{i}") for i in range(0, 100, 2)]
+        return added, deleted
+
+    async def run():
+        return await asyncio.gather(inventory.add_items(batch), singles())
+
+    bulk, (added, deleted) = asyncio.run(run())
+    assert bulk == len(batch) and all(added) and all(deleted)
+    assert inventory.item_count == len(batch) + 2 * 50